@@ -9,6 +9,27 @@ from google.adk.sessions import InMemorySessionService
 from google.genai import types
 
 
+# Tool lists with some functions left out. FunctionTool builds new declarations on every
+# model call, so the lists are keyed by the declared names and the excluded names
+_tool_variants = {}
+
+
+def select_tools(tools, excluded):
+    """Returns the tool list without the excluded functions, built once per declarations."""
+    declarations = tuple(declaration for tool in tools for declaration in tool.function_declarations or [])
+    key = (tuple((declaration.name, declaration.description) for declaration in declarations), excluded)
+    if key not in _tool_variants:
+        _tool_variants[key] = [
+            tool.model_copy(update={
+                "function_declarations": [
+                    declaration for declaration in tool.function_declarations or [] if declaration.name not in excluded
+                ]
+            })
+            for tool in tools
+        ]
+    return _tool_variants[key]
+
+
 def simple_before_model_callback(
     callback_context: CallbackContext,
     llm_request: LlmRequest,
@@ -17,8 +38,7 @@ def simple_before_model_callback(
     print(f"[Callback] Before model call for agent  {agent_name}")
     
     if callback_context.state["disable_tool"]:
-        for tool in llm_request.config.tools:
-            tool.function_declarations = [declaration for declaration in tool.function_declarations if declaration.name != "get_revenue"]
+        llm_request.config.tools = select_tools(llm_request.config.tools, frozenset(["get_revenue"]))
 
     # print(".tools_dict:", llm_request.tools_dict)
     # print(".config.tools:", llm_request.config.tools)  
@@ -75,9 +95,23 @@ def get_runner(agent: Agent, app_name: str, session_service: InMemorySessionServ
         session_service=session_service
     )
 
+# Runners built once per agent configuration and reused across turns
+_runners = {}
+
+
+def get_pooled_runner(disable_tool: bool, app_name: str, session_service: InMemorySessionService) -> Runner:
+    """Returns the runner of the configuration, creating it on first use."""
+    key = (disable_tool, app_name)
+    if key not in _runners:
+        _runners[key] = get_runner(
+            agent=get_agent(disable_tool=disable_tool),
+            app_name=app_name,
+            session_service=session_service
+        )
+    return _runners[key]
+
 async def main():
     app_name = "Financial APP"
-    agent = get_agent()
     session_service = InMemorySessionService()
     
     user_id = "user123"
@@ -94,10 +128,8 @@ async def main():
             timestamp=time.time()
         )
         
-        agent = get_agent(disable_tool=False)
-        
-        runner = get_runner(
-            agent=agent,
+        runner = get_pooled_runner(
+            disable_tool=False,
             app_name=app_name,
             session_service=session_service
         )
@@ -1 +1,2 @@
-from .agent import create_agent, get_agent
\ No newline at end of file
+from .agent import AgentVariant, create_agent, get_agent, get_tool_registry
+from .runner_pool import RunnerPool
\ No newline at end of file
@@ -1,50 +1,89 @@
+import asyncio
 import datetime
 import types
 
-from typing import Dict, Any, Optional
+from typing import Dict, Any, FrozenSet, Optional, Type
 
 from google.adk.agents import Agent
 from google.adk.agents.callback_context import CallbackContext
-from google.adk.models import LlmRequest, LlmResponse
-from google.adk.models.lite_llm import LiteLlm
+from google.adk.models import BaseLlm, LLMRegistry, LlmRequest, LlmResponse
 from google.adk.tools.base_tool import BaseTool, ToolContext 
-from google.adk.tools.mcp_tool.mcp_toolset import MCPToolset, SseServerParams
+from google.adk.tools.mcp_tool.mcp_toolset import SseServerParams
+from pydantic import BaseModel, ConfigDict, Field
+
+from core.config import config, parse_list
+from core.event_log import event_log
+from core.metrics import metrics
+from tool.pool import MCPConnectionPool
+from tool.registry import ToolRegistry, ToolSubset
+
+from .compaction import compact_history_modifier
+from .instrumentation import observe_model_latency, start_model_timer
+from .model_router import ModelRouter
+from .parallel_tools import create_parallel_tool_runner
+from .response_cache import model_response_cache
+from .semantic_cache import semantic_response_cache
+from .tool_cache import tool_result_cache
+from .tool_guard import tool_guard
+from .tool_variants import tool_variants
+
+RAG_TOOLS = frozenset(["semantic_search", "keyword_search"])
+
+def scope_history_modifier(
+    callback_context: CallbackContext,
+    llm_request: LlmRequest,
+) -> Optional[LlmResponse]:
+    """Drops contents older than the last use_rag toggle when history scoping is enabled."""
+    scope_start = callback_context.state.get("history_scope_start")
+    if not scope_start:
+        return None
+
+    scoped_contents = sum(
+        1
+        for event in callback_context._invocation_context.session.events
+        if event.timestamp >= scope_start
+        and event.content
+        and event.content.role
+        and event.content.parts
+        and event.content.parts[0].text != ""
+    )
+    if scoped_contents:
+        llm_request.contents = llm_request.contents[-scoped_contents:]
+    return None
 
 def simple_before_model_modifier(
     callback_context: CallbackContext,
     llm_request: LlmRequest,
 ) -> Optional[LlmResponse]:
     agent_name = callback_context.agent_name
-    print(f"[Callback] Before model call for agent  {agent_name}")
-    
-    print(f"[Callback] The contents in LLM request: {llm_request.contents}")
     
-    # if not callback_context.state["user:use_rag"]:
-    #     for tool in llm_request.config.tools:
-    #         tool.function_declarations = [
-    #             declaration 
-    #             for declaration in tool.function_declarations 
-    #             if declaration.name not in ["semantic_search", "keyword_search"]
-    #         ]
+    if config.rag_filter_tools and not callback_context.state.get("user:use_rag"):
+        llm_request.config.tools = tool_variants.select(llm_request.config.tools, RAG_TOOLS)
     
-    print(
-        f"[Callback] Tools after modification: {
-        [
-            function_declaration.name
-            for tool in llm_request.config.tools
-            for function_declaration in tool.function_declarations  
-        ]}"
+    if event_log.should_log("model_request"):
+        event_log.emit(
+            "model_request",
+            agent=agent_name,
+            contents=llm_request.contents,
+            tools=[
+                function_declaration.name
+                for tool in llm_request.config.tools or []
+                for function_declaration in tool.function_declarations or []
+            ]
+        )
+    return None
+
+def is_tool_disabled(tool_name: str, state) -> bool:
+    """semantic_search only runs when RAG mode is enabled."""
+    return tool_name == 'semantic_search' and not state.get("user:use_rag")
+
+def is_tool_answered(tool: BaseTool, args: Dict[str, Any], tool_context: ToolContext) -> bool:
+    """Tells whether the before-tool callbacks answer the call without running the tool."""
+    return (
+        is_tool_disabled(tool.name, tool_context.state)
+        or tool_result_cache.contains(tool.name, args)
+        or not tool_guard.allow_call(tool.name, tool_context)
     )
-        
-    last_user_message = ""
-    if llm_request.contents and llm_request.contents[-1].role == 'user':
-        if llm_request.contents[-1].parts:
-            last_user_message = llm_request.contents[-1].parts[0].text
-        
-        print(f"[Callback] Inspecting last user message: '{last_user_message}'")
-    
-        # if callback_context.state["use_rag"]:
-        #     llm_request.contents[-1].parts[0].text = f"{last_user_message} (use Semantic Search to answer this question)"
 
 def simple_before_tool_modifier(
     tool: BaseTool, args: Dict[str, Any], tool_context: ToolContext
@@ -52,54 +91,143 @@ def simple_before_tool_modifier(
     """Inspects/modifies tool args or skips the tool call."""
     agent_name = tool_context.agent_name
     tool_name = tool.name
-    print(f"[Callback] Before tool call for tool '{tool_name}' in agent '{agent_name}'")
-    print(f"[Callback] Original args: {args}")
+    event_log.log("tool_call", agent=agent_name, tool=tool_name, args=args)
 
     # If the tool is 'semantic_search' and country is 'BLOCK'
-    if tool_name == 'semantic_search' and not tool_context.state.get("user:use_rag"):
-        print("[Callback] Detected calling semantic_search tool but not enable use_rag. Skipping tool execution.")
+    if is_tool_disabled(tool_name, tool_context.state):
+        event_log.log("tool_skipped", agent=agent_name, tool=tool_name, reason="use_rag disabled")
         return {"result": "Tool execution skipped due to not enabling RAG mode"}
 
-    print("[Callback] Proceeding with original or previously modified args.")
     return None
 
 
-_agent = None
+parallel_tool_runner = create_parallel_tool_runner(skip=is_tool_answered)
 
-async def get_agent() -> Agent:
-    global _agent
-    if _agent is None:
-        _agent = await create_agent()
-    return _agent
+DEFAULT_INSTRUCTION = (
+    "You are a helpful agent that can answer questions based on the provided documents. "
+    "If this value {user:use_rag} is true, force you to use tool semantic_search to retrieve information from the documents."
+)
 
-async def create_agent():
-    """Gets tools from MCP Server"""
-    remote_tools = MCPToolset(
-        connection_params=SseServerParams(
-            url="http://127.0.0.1:17324/mcp-server/sse"
-        )
+
+class AgentVariant(BaseModel):
+    """Configuration an agent is built for, agents are built once per variant."""
+    model_config = ConfigDict(frozen=True)
+
+    model: str = Field(default_factory=lambda: config.agent_model, description="Gemini model name, or another model name for LiteLLM")
+    small_model: Optional[str] = Field(
+        default_factory=lambda: config.router_small_model or None,
+        description="Model answering the simple turns instead of model, none routes every turn to model"
     )
+    tools: Optional[FrozenSet[str]] = Field(default=None, description="Names of the MCP tools offered to the model, all when None")
+    instruction: str = Field(default=DEFAULT_INSTRUCTION, description="System instruction of the agent")
 
-    for index, tool in enumerate(await remote_tools.get_tools()):
-        print(f"Tool {index}: {tool._get_declaration().name}")
-    
-    model = "gemini-2.5-flash-preview-05-20"
-    # - Gemini hosted by Google
-    
-    # model_name = "qwen3:1.7B"
-    # model = LiteLlm(model=f"ollama_chat/{model_name}")
+
+_agents: Dict[AgentVariant, Agent] = {}
+_agent_locks: Dict[AgentVariant, asyncio.Lock] = {}
+_tool_registry: Optional[ToolRegistry] = None
+_tool_registry_lock = asyncio.Lock()
+
+async def get_agent(variant: Optional[AgentVariant] = None) -> Agent:
+    """Returns the agent of the variant, building it on first use."""
+    variant = variant or AgentVariant()
+    agent = _agents.get(variant)
+    if agent is None:
+        async with _agent_locks.setdefault(variant, asyncio.Lock()):
+            agent = _agents.get(variant)
+            if agent is None:
+                agent = _agents[variant] = await create_agent(variant)
+    return agent
+
+def get_tool_registry() -> Optional[ToolRegistry]:
+    return _tool_registry
+
+async def start_tool_registry() -> ToolRegistry:
+    """Gets tools from MCP Server, once for all agents"""
+    global _tool_registry
+
+    async with _tool_registry_lock:
+        if _tool_registry is not None:
+            return _tool_registry
+
+        remote_tools = ToolRegistry(
+            lambda: MCPConnectionPool(
+                SseServerParams(
+                    url=config.mcp_server_url
+                ),
+                size=config.mcp_pool_size,
+                health_interval=config.mcp_health_interval,
+                max_backoff=config.mcp_reconnect_max_backoff,
+                idempotent_tools=parse_list(config.tool_coalesce),
+            ),
+            refresh_interval=config.tool_refresh_interval,
+            drain_grace=config.toolset_drain_grace,
+            drain_timeout=config.toolset_drain_timeout,
+        )
+        await remote_tools.start()
+        _tool_registry = remote_tools
+        metrics.register_gauges(
+            "agent_mcp_pool", remote_tools.stats, help="Connections of the current MCP toolset"
+        )
+        return remote_tools
+
+def resolve_model_class(name: str) -> Optional[Type[BaseLlm]]:
+    """Returns the ADK model class of the name, None for models served through LiteLLM."""
+    try:
+        # The Gemini API also accepts names prefixed with "models/"
+        return LLMRegistry.resolve(name.removeprefix("models/"))
+    except ValueError:
+        return None
+
+def build_model(name: str) -> BaseLlm:
+    # - Gemini hosted by Google, e.g. "gemini-2.5-flash-preview-05-20" or a Vertex endpoint
+    # - Self-hosted through LiteLLM, e.g. "ollama_chat/qwen3:1.7B"
+    # A model name would be resolved to a new client on every model call, the instance
+    # keeps one client and its connection pool for the lifetime of the agent
+    model_class = resolve_model_class(name)
+    if model_class is None:
+        # litellm takes seconds to import, only load it when a LiteLLM model is configured
+        from google.adk.models.lite_llm import LiteLlm
+        return LiteLlm(model=name)
+    return model_class(model=name)
+
+async def create_agent(variant: Optional[AgentVariant] = None) -> Agent:
+    variant = variant or AgentVariant()
+    remote_tools = await start_tool_registry()
+
+    model = build_model(variant.model)
+    if variant.small_model:
+        model = ModelRouter(
+            model=f"{variant.small_model}|{variant.model}",
+            small=build_model(variant.small_model),
+            large=model,
+        )
     
     agent = Agent(
         name="tool_agent",
-        model=model, # Self-hosted model 
+        model=model,
         description="An agent that can answer questions based on provided documents and use tools to retrieve information",
-        instruction=(
-            "You are a helpful agent that can answer questions based on the provided documents. "
-            "If this value {user:use_rag} is true, force you to use tool semantic_search to retrieve information from the documents."
-        ),
-        tools=[remote_tools],
-        before_model_callback=simple_before_model_modifier,
-        before_tool_callback=simple_before_tool_modifier
+        instruction=variant.instruction,
+        tools=[remote_tools if variant.tools is None else ToolSubset(remote_tools, variant.tools)],
+        before_model_callback=[
+            scope_history_modifier,
+            compact_history_modifier,
+            simple_before_model_modifier,
+            model_response_cache.lookup,
+            *([semantic_response_cache.lookup] if config.semantic_cache_enabled else []),
+            start_model_timer,
+        ],
+        after_model_callback=[
+            observe_model_latency,
+            model_response_cache.store,
+            *([semantic_response_cache.store] if config.semantic_cache_enabled else []),
+        ],
+        before_tool_callback=[
+            simple_before_tool_modifier,
+            tool_result_cache.lookup,
+            tool_guard.before,
+            parallel_tool_runner,
+        ],
+        after_tool_callback=[tool_result_cache.store],
     )
     
     return agent
@@ -0,0 +1,160 @@
+import hashlib
+import json
+
+from typing import Awaitable, Callable, List, Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+from google.genai import types
+
+from core.config import config
+
+Turn = List[types.Content]
+Summarizer = Callable[[str, List[Turn]], Awaitable[str]]
+
+STALE_TOOL_RESULT = {"result": "Result of an earlier tool call, dropped to save context"}
+
+
+def estimate_tokens(contents: List[types.Content]) -> int:
+    """Roughly estimates the tokens of the contents, about 4 characters per token."""
+    characters = 0
+    for content in contents:
+        for part in content.parts or []:
+            if part.text:
+                characters += len(part.text)
+            if part.function_call:
+                characters += len(json.dumps(part.function_call.args or {}, default=str))
+            if part.function_response:
+                characters += len(json.dumps(part.function_response.response or {}, default=str))
+    return characters // 4
+
+
+def split_turns(contents: List[types.Content]) -> List[Turn]:
+    """Splits the contents into turns, each starting with a user text message."""
+    turns: List[Turn] = []
+    for content in contents:
+        starts_turn = content.role == "user" and any(part.text for part in content.parts or [])
+        if starts_turn or not turns:
+            turns.append([])
+        turns[-1].append(content)
+    return turns
+
+
+def turn_fingerprint(turn: Turn, previous: str = "") -> str:
+    """Hashes the text of the turn chained to the fingerprint of the turn before it.
+
+    Identical turns at different points of the conversation get different fingerprints.
+    """
+    text = "".join(part.text or "" for content in turn for part in content.parts or [])
+    return hashlib.sha1(f"{previous}:{text}".encode()).hexdigest()[:16]
+
+
+async def extractive_summary(summary: str, turns: List[Turn]) -> str:
+    """Appends the question and final answer of each turn to the summary."""
+    lines = [summary] if summary else []
+    for turn in turns:
+        question = " ".join(part.text for part in turn[0].parts or [] if part.text)
+        answers = [
+            part.text
+            for content in turn
+            if content.role == "model"
+            for part in content.parts or []
+            if part.text
+        ]
+        tools = sorted({
+            part.function_call.name
+            for content in turn
+            for part in content.parts or []
+            if part.function_call
+        })
+        line = f"- User: {question[:300]}"
+        if tools:
+            line += f" | Tools used: {', '.join(tools)}"
+        if answers:
+            line += f" | Agent: {answers[-1][:300]}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+class HistoryCompactor:
+    """Keeps the contents sent to the model within a token budget.
+
+    The last keep_turns turns are sent verbatim, older turns are folded into a rolling
+    summary cached in the session state, and tool results of all but the current turn
+    are replaced by a placeholder. If the kept turns still exceed token_budget, the
+    oldest of them are folded into the summary as well.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 8000,
+        keep_turns: int = 6,
+        max_summary_chars: int = 4000,
+        summarizer: Summarizer = extractive_summary,
+    ):
+        self.token_budget = token_budget
+        self.keep_turns = keep_turns
+        self.max_summary_chars = max_summary_chars
+        self.summarizer = summarizer
+
+    async def __call__(
+        self,
+        callback_context: CallbackContext,
+        llm_request: LlmRequest,
+    ) -> Optional[LlmResponse]:
+        if self.token_budget <= 0 or not llm_request.contents:
+            return None
+
+        turns = split_turns(llm_request.contents)
+        for turn in turns[:-1]:
+            for content in turn:
+                for part in content.parts or []:
+                    if part.function_response:
+                        part.function_response.response = STALE_TOOL_RESULT
+
+        kept = max(1, self.keep_turns)
+        while kept > 1 and estimate_tokens([content for turn in turns[-kept:] for content in turn]) > self.token_budget:
+            kept -= 1
+        older_turns, recent_turns = turns[:-kept], turns[-kept:]
+        if not older_turns:
+            llm_request.contents = [content for turn in recent_turns for content in turn]
+            return None
+
+        summary = await self.update_summary(callback_context, older_turns)
+        summary_content = types.Content(
+            role="user",
+            parts=[types.Part(text=f"Summary of the earlier conversation:\n{summary}")]
+        )
+        llm_request.contents = [summary_content] + [content for turn in recent_turns for content in turn]
+        return None
+
+    async def update_summary(self, callback_context: CallbackContext, older_turns: List[Turn]) -> str:
+        """Folds the older turns not yet in the cached summary into it."""
+        summary = callback_context.state.get("history_summary", "")
+        last_folded = callback_context.state.get("history_summary_last_turn")
+
+        fingerprints = []
+        for turn in older_turns:
+            fingerprints.append(turn_fingerprint(turn, fingerprints[-1] if fingerprints else ""))
+        if last_folded in fingerprints:
+            new_turns = older_turns[fingerprints.index(last_folded) + 1:]
+        else:
+            # The history no longer contains the last folded turn, e.g. after scoping, so start over
+            summary, new_turns = "", older_turns
+
+        if not new_turns:
+            return summary
+
+        summary = await self.summarizer(summary, new_turns)
+        if len(summary) > self.max_summary_chars:
+            summary = summary[-self.max_summary_chars:]
+        callback_context.state["history_summary"] = summary
+        callback_context.state["history_summary_last_turn"] = fingerprints[-1]
+        return summary
+
+
+compact_history_modifier = HistoryCompactor(
+    token_budget=config.compaction_token_budget,
+    keep_turns=config.compaction_keep_turns,
+    max_summary_chars=config.compaction_summary_chars,
+)
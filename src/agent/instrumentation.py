@@ -0,0 +1,42 @@
+import time
+
+from typing import Optional, Tuple
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+from google.adk.tools.base_tool import BaseTool
+
+from core.metrics import metrics
+
+from .pending import PendingCalls
+
+# Start time and model of the pending model call
+_model_calls: PendingCalls[Tuple[float, str]] = PendingCalls()
+
+
+def start_model_timer(
+    callback_context: CallbackContext,
+    llm_request: LlmRequest,
+) -> Optional[LlmResponse]:
+    """Records the start of a model call, registered last among the before-model callbacks."""
+    _model_calls.put(callback_context.invocation_id, (time.perf_counter(), llm_request.model or "unknown"))
+    return None
+
+
+def observe_model_latency(
+    callback_context: CallbackContext,
+    llm_response: LlmResponse,
+) -> Optional[LlmResponse]:
+    """Observes the model call latency once its complete response arrives."""
+    if llm_response.partial:
+        return None
+    started = _model_calls.pop(callback_context.invocation_id)
+    if started:
+        start, model = started
+        metrics.observe("agent_stage_duration_seconds", time.perf_counter() - start, stage="model", model=model)
+    return None
+
+
+def observe_tool_latency(tool: BaseTool, seconds: float):
+    """Observes the latency of a tool call, timed by the parallel tool runner running every call."""
+    metrics.observe("agent_stage_duration_seconds", seconds, stage="tool", tool=tool.name)
@@ -0,0 +1,93 @@
+import re
+import time
+
+from typing import AsyncGenerator, FrozenSet, Tuple
+
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.adk.models.base_llm_connection import BaseLlmConnection
+from pydantic import BaseModel, ConfigDict, Field
+
+from core.config import config, parse_list
+from core.event_log import event_log
+from core.metrics import metrics
+
+from .compaction import estimate_tokens
+from .semantic_cache import last_user_message
+
+_WORD = re.compile(r"[\w']+")
+
+SMALL = "small"
+LARGE = "large"
+
+
+class RoutingPolicy(BaseModel):
+    """Decides which model answers a request, the small one only for simple turns."""
+    model_config = ConfigDict(frozen=True)
+
+    max_message_chars: int = Field(default_factory=lambda: config.router_max_message_chars)
+    max_context_tokens: int = Field(default_factory=lambda: config.router_max_context_tokens)
+    complex_keywords: FrozenSet[str] = Field(
+        default_factory=lambda: frozenset(keyword.lower() for keyword in parse_list(config.router_complex_keywords))
+    )
+
+    def route(self, llm_request: LlmRequest) -> Tuple[str, str]:
+        """Returns the route of the request and the reason it was chosen."""
+        message = last_user_message(llm_request)
+        # Past the first model call the turn works with tool results
+        if not message:
+            return LARGE, "tool_turn"
+        if len(message) > self.max_message_chars:
+            return LARGE, "long_message"
+        if estimate_tokens(llm_request.contents) > self.max_context_tokens:
+            return LARGE, "long_context"
+        words = set(_WORD.findall(message.lower()))
+        if words & self.complex_keywords:
+            return LARGE, "keyword"
+        return SMALL, "simple"
+
+
+class ModelRouter(BaseLlm):
+    """Sends simple turns to a small model, such as a local one, and the others to the large one.
+
+    Requests the small model fails before answering anything are retried on the large one.
+    """
+
+    small: BaseLlm
+    large: BaseLlm
+    policy: RoutingPolicy = Field(default_factory=RoutingPolicy)
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        route, reason = self.policy.route(llm_request)
+        metrics.inc("agent_model_routes_total", route=route, reason=reason)
+
+        if route == SMALL:
+            start = time.perf_counter()
+            answered = False
+            try:
+                llm_request.model = self.small.model
+                async for llm_response in self.small.generate_content_async(llm_request, stream):
+                    answered = True
+                    yield llm_response
+                metrics.observe("agent_model_route_duration_seconds", time.perf_counter() - start, route=SMALL)
+                return
+            except Exception as e:
+                if answered:
+                    raise
+                event_log.log("model_route_failed", route=SMALL, model=self.small.model, error=str(e))
+                metrics.inc("agent_model_routes_total", route=LARGE, reason="fallback")
+
+        start = time.perf_counter()
+        llm_request.model = self.large.model
+        async for llm_response in self.large.generate_content_async(llm_request, stream):
+            yield llm_response
+        metrics.observe("agent_model_route_duration_seconds", time.perf_counter() - start, route=LARGE)
+
+    def connect(self, llm_request: LlmRequest) -> BaseLlmConnection:
+        llm_request.model = self.large.model
+        return self.large.connect(llm_request)
+
+
+metrics.describe("agent_model_routes_total", "Model requests by route and reason of the routing decision")
+metrics.describe("agent_model_route_duration_seconds", "Duration of the model requests of each route")
@@ -0,0 +1,99 @@
+import asyncio
+import time
+
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.tools.base_tool import BaseTool, ToolContext
+
+from core.config import config
+
+from .instrumentation import observe_tool_latency
+from .pending import PendingCalls
+from .single_flight import Execute, single_flight
+
+Skip = Callable[[BaseTool, Dict[str, Any], ToolContext], bool]
+
+
+class ParallelToolRunner:
+    """Runs the function calls of one model response concurrently.
+
+    ADK runs the calls of a response one after another, each through the before-tool
+    callbacks. Registered as the last of them, this runner starts all calls of the
+    response when the first one reaches it, at most max_concurrency at a time, and hands
+    every later call its own result, so ADK still assembles the responses in order. Calls
+    for which skip returns True are left to ADK, skip mirrors the earlier callbacks that
+    answer without running the tool, a call ADK still hands over later is started then.
+    Calls left unclaimed when the invocation ends, after an earlier call failed, are
+    cancelled. Every call run is timed here, as ADK reaches the later ones only once
+    they finished.
+    """
+
+    def __init__(self, execute: Execute, max_concurrency: int = 4, skip: Optional[Skip] = None):
+        self.execute = execute
+        self.max_concurrency = max(1, max_concurrency)
+        self.skip = skip
+        # Started call and its tool context
+        self._started: PendingCalls[Tuple[asyncio.Task, ToolContext]] = PendingCalls(
+            on_drop=lambda started: started[0].cancel()
+        )
+
+    async def __call__(self, tool: BaseTool, args: Dict[str, Any], tool_context: ToolContext) -> Optional[Any]:
+        started = self._started.pop(tool_context.invocation_id, tool_context.function_call_id)
+        if started is None:
+            await self._start_calls(tool, args, tool_context)
+            started = self._started.pop(tool_context.invocation_id, tool_context.function_call_id)
+
+        task, started_context = started
+        result = await task
+        if started_context is not tool_context:
+            # State changes made by the tool belong to the response event ADK builds
+            tool_context.actions.state_delta.update(started_context.actions.state_delta)
+
+        # A falsy response would make ADK run the tool again
+        return result if result else {"result": result}
+
+    async def _start_calls(self, tool: BaseTool, args: Dict[str, Any], tool_context: ToolContext):
+        """Starts this call and the ones following it in its model response."""
+        invocation_context = tool_context._invocation_context
+        function_calls = []
+        for event in reversed(invocation_context.session.events):
+            function_calls = event.get_function_calls()
+            if any(function_call.id == tool_context.function_call_id for function_call in function_calls):
+                break
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        task = asyncio.create_task(self._run_limited(semaphore, tool, args, tool_context))
+        self._started.put(tool_context.invocation_id, (task, tool_context), tool_context.function_call_id)
+
+        call_ids = [function_call.id for function_call in function_calls]
+        if tool_context.function_call_id not in call_ids or len(call_ids) < 2:
+            return
+
+        agent_tools = await invocation_context.agent.canonical_tools(ReadonlyContext(invocation_context))
+        tools = {agent_tool.name: agent_tool for agent_tool in agent_tools}
+        for function_call in function_calls[call_ids.index(tool_context.function_call_id) + 1:]:
+            sibling_tool = tools.get(function_call.name)
+            if sibling_tool is None:
+                continue
+            sibling_args = function_call.args or {}
+            sibling_context = ToolContext(invocation_context, function_call_id=function_call.id)
+            if self._started.get(tool_context.invocation_id, function_call.id) is not None:
+                continue
+            if self.skip is not None and self.skip(sibling_tool, sibling_args, sibling_context):
+                continue
+            task = asyncio.create_task(self._run_limited(semaphore, sibling_tool, sibling_args, sibling_context))
+            self._started.put(tool_context.invocation_id, (task, sibling_context), function_call.id)
+
+    async def _run_limited(
+        self, semaphore: asyncio.Semaphore, tool: BaseTool, args: Dict[str, Any], tool_context: ToolContext
+    ) -> Any:
+        async with semaphore:
+            start = time.perf_counter()
+            result = await self.execute(tool, args, tool_context)
+            observe_tool_latency(tool, time.perf_counter() - start)
+            return result
+
+
+def create_parallel_tool_runner(skip: Optional[Skip] = None) -> ParallelToolRunner:
+    return ParallelToolRunner(single_flight.run, max_concurrency=config.tool_parallelism, skip=skip)
@@ -0,0 +1,52 @@
+import asyncio
+
+from typing import Callable, Dict, Generic, Optional, Set, TypeVar
+
+V = TypeVar("V")
+
+
+class PendingCalls(Generic[V]):
+    """Values a callback hands to a later callback of the same model or tool call.
+
+    Values are kept per invocation, keyed by function call id or "" for the model call.
+    The callbacks of an invocation run in the task iterating Runner.run_async, so the
+    values of an invocation whose later callback never ran, after a failed or skipped
+    call or a cancelled turn, are dropped once that task finishes.
+    """
+
+    def __init__(self, on_drop: Optional[Callable[[V], None]] = None):
+        self.on_drop = on_drop
+        self._invocations: Dict[str, Dict[str, V]] = {}
+        # Invocations whose task drops their values when it finishes
+        self._watched: Set[str] = set()
+
+    def put(self, invocation_id: str, value: V, call_id: str = ""):
+        if invocation_id not in self._watched:
+            task = asyncio.current_task()
+            if task is not None:
+                self._watched.add(invocation_id)
+                task.add_done_callback(lambda _: self.drop(invocation_id))
+        self._invocations.setdefault(invocation_id, {})[call_id] = value
+
+    def get(self, invocation_id: str, call_id: str = "") -> Optional[V]:
+        return self._invocations.get(invocation_id, {}).get(call_id)
+
+    def pop(self, invocation_id: str, call_id: str = "") -> Optional[V]:
+        calls = self._invocations.get(invocation_id)
+        if not calls:
+            return None
+        value = calls.pop(call_id, None)
+        if not calls:
+            del self._invocations[invocation_id]
+        return value
+
+    def drop(self, invocation_id: str):
+        """Drops the values of the invocation, passing each to on_drop."""
+        self._watched.discard(invocation_id)
+        calls = self._invocations.pop(invocation_id, None)
+        if calls and self.on_drop is not None:
+            for value in calls.values():
+                self.on_drop(value)
+
+    def __len__(self) -> int:
+        return sum(len(calls) for calls in self._invocations.values())
@@ -0,0 +1,129 @@
+import hashlib
+import json
+import re
+import time
+
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.agents.run_config import StreamingMode
+from google.adk.models import LlmRequest, LlmResponse
+from google.genai import types
+
+from core.config import config, parse_list
+from core.metrics import metrics
+
+from .pending import PendingCalls
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def collapse_whitespace(text: str) -> str:
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def normalize_contents(contents: List[types.Content]) -> list:
+    """Reduces the contents to what the model sees, with whitespace collapsed and call ids left out."""
+    normalized = []
+    for content in contents:
+        parts = []
+        for part in content.parts or []:
+            if part.text:
+                parts.append(collapse_whitespace(part.text))
+            if part.function_call:
+                parts.append(["call", part.function_call.name, part.function_call.args])
+            if part.function_response:
+                parts.append(["response", part.function_response.name, part.function_response.response])
+        normalized.append([content.role, parts])
+    return normalized
+
+
+def request_key(llm_request: LlmRequest) -> str:
+    """Hashes the model, instruction, tool declarations and normalized contents of the request."""
+    request_config = llm_request.config
+    described = [
+        llm_request.model,
+        request_config.system_instruction if request_config else None,
+        [tool.model_dump(mode="json", exclude_none=True) for tool in request_config.tools or []] if request_config else None,
+        normalize_contents(llm_request.contents),
+    ]
+    encoded = json.dumps(described, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def is_streaming(callback_context: CallbackContext) -> bool:
+    """Tells whether the model streams its responses, one call then ends in several complete chunks."""
+    return callback_context._invocation_context.run_config.streaming_mode == StreamingMode.SSE
+
+
+class ModelResponseCache:
+    """Answers model requests identical to a recent one with the response it got.
+
+    lookup is registered as the last before-model callback preceding the timer, once the
+    other callbacks shaped the request, and store as an after-model callback. Complete
+    responses are kept for ttl seconds, at most max_entries of them with the least
+    recently used evicted first. Users listed in opt_out_users are never served from the
+    cache nor added to it. Streamed calls are served from the cache but never added to it,
+    their text and function calls arrive as separate complete responses.
+    """
+
+    def __init__(self, ttl: float = 300, max_entries: int = 1000, opt_out_users: Iterable[str] = ()):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.opt_out_users = set(opt_out_users)
+        # key -> (expires at, response JSON)
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        # Key of the pending model call
+        self._pending: PendingCalls[str] = PendingCalls()
+
+    def lookup(self, callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+        if self.ttl <= 0 or callback_context._invocation_context.user_id in self.opt_out_users:
+            return None
+
+        key = request_key(llm_request)
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, encoded = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                metrics.inc("agent_llm_cache_requests_total", result="hit")
+                return LlmResponse.model_validate_json(encoded)
+            del self._entries[key]
+
+        metrics.inc("agent_llm_cache_requests_total", result="miss")
+        if is_streaming(callback_context):
+            return None
+        self._pending.put(callback_context.invocation_id, key)
+        return None
+
+    def store(self, callback_context: CallbackContext, llm_response: LlmResponse) -> Optional[LlmResponse]:
+        if llm_response.partial:
+            return None
+        key = self._pending.pop(callback_context.invocation_id)
+        if key is None or llm_response.error_code or not llm_response.content:
+            return None
+
+        response = llm_response.model_copy(deep=True)
+        # ADK gives the function calls of every response new ids
+        for part in response.content.parts or []:
+            if part.function_call:
+                part.function_call.id = None
+
+        self._entries[key] = (time.monotonic() + self.ttl, response.model_dump_json(exclude_none=True))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return None
+
+    def stats(self) -> Dict[str, float]:
+        return {"entries": len(self._entries)}
+
+
+model_response_cache = ModelResponseCache(
+    ttl=config.llm_cache_ttl,
+    max_entries=config.llm_cache_max_entries,
+    opt_out_users=parse_list(config.llm_cache_opt_out),
+)
+metrics.describe("agent_llm_cache_requests_total", "Lookups of the model response cache by result")
+metrics.register_gauges("agent_llm_cache", model_response_cache.stats, help="Size of the model response cache")
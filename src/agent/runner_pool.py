@@ -0,0 +1,50 @@
+import asyncio
+
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+
+from google.adk.agents import Agent
+from google.adk.runners import Runner
+from google.adk.sessions import BaseSessionService
+
+from .agent import AgentVariant, get_agent
+
+AgentFactory = Callable[[Optional[AgentVariant]], Awaitable[Agent]]
+
+
+class RunnerPool:
+    """Runners of one app, built once per agent variant and shared by all requests.
+
+    A runner holds no per-request state, so once built a variant is resolved with a
+    dictionary lookup.
+    """
+
+    def __init__(self, app_name: str, session_service: BaseSessionService, agent_factory: AgentFactory = get_agent):
+        self.app_name = app_name
+        self.session_service = session_service
+        self.agent_factory = agent_factory
+        self.default_variant = AgentVariant()
+        self._runners: Dict[AgentVariant, Runner] = {}
+        self._locks: Dict[AgentVariant, asyncio.Lock] = {}
+
+    async def get(self, variant: Optional[AgentVariant] = None) -> Runner:
+        variant = variant or self.default_variant
+        runner = self._runners.get(variant)
+        if runner is not None:
+            return runner
+
+        async with self._locks.setdefault(variant, asyncio.Lock()):
+            runner = self._runners.get(variant)
+            if runner is None:
+                runner = self._runners[variant] = Runner(
+                    agent=await self.agent_factory(variant),
+                    app_name=self.app_name,
+                    session_service=self.session_service
+                )
+        return runner
+
+    async def warm(self, variants: Iterable[AgentVariant] = ()):
+        """Builds the runners of the default and the given variants ahead of requests."""
+        await asyncio.gather(self.get(), *(self.get(variant) for variant in variants))
+
+    def __len__(self) -> int:
+        return len(self._runners)
@@ -0,0 +1,192 @@
+import hashlib
+import json
+import time
+
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+
+from core.config import config, parse_list
+from core.event_log import event_log
+from core.metrics import metrics
+
+from .pending import PendingCalls
+from .response_cache import collapse_whitespace, is_streaming, normalize_contents
+
+Embed = Callable[[str], Awaitable[List[float]]]
+
+SIMILARITY_BUCKETS = (0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.925, 0.95, 0.975, 0.99, 1.0)
+
+
+def gemini_embedder(model: str) -> Embed:
+    """Embeds texts with a Gemini embedding model, creating the client on first use."""
+    client = None
+
+    async def embed(text: str) -> List[float]:
+        nonlocal client
+        if client is None:
+            from google.genai import Client
+            client = Client()
+        response = await client.aio.models.embed_content(model=model, contents=text)
+        return response.embeddings[0].values
+
+    return embed
+
+
+def last_user_message(llm_request: LlmRequest) -> str:
+    """Text of the user message starting the turn, empty once the turn called tools."""
+    if not llm_request.contents or llm_request.contents[-1].role != "user":
+        return ""
+    parts = llm_request.contents[-1].parts or []
+    if any(part.function_response for part in parts):
+        return ""
+    return collapse_whitespace(" ".join(part.text for part in parts if part.text))
+
+
+def request_context(llm_request: LlmRequest) -> int:
+    """Hashes what besides the last user message shapes the answer: model, instruction, tools and history."""
+    request_config = llm_request.config
+    described = [
+        llm_request.model,
+        request_config.system_instruction if request_config else None,
+        sorted(
+            function_declaration.name
+            for tool in (request_config.tools if request_config else None) or []
+            for function_declaration in tool.function_declarations or []
+        ),
+        normalize_contents(llm_request.contents[:-1]),
+    ]
+    encoded = json.dumps(described, sort_keys=True, ensure_ascii=False, default=str)
+    return int.from_bytes(hashlib.sha256(encoded.encode()).digest()[:8], "little", signed=True)
+
+
+class SemanticResponseCache:
+    """Answers a paraphrase of a recent question with the final answer the question got.
+
+    The user message starting a turn is embedded and compared by cosine similarity with
+    the earlier questions asked in the same context, which are the rows of a matrix of
+    unit vectors. Above threshold the turn ends with the cached answer without calling the
+    model or any tool. Otherwise the final text answer of the turn is stored, replacing an
+    expired row or else the least recently used one. Streamed turns are never stored, their
+    text preceding tool calls arrives as a complete response of its own.
+    """
+
+    def __init__(
+        self,
+        embed: Embed,
+        threshold: float = 0.95,
+        max_entries: int = 10000,
+        ttl: float = 3600,
+        opt_out_users: Iterable[str] = (),
+    ):
+        self.embed = embed
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.opt_out_users = set(opt_out_users)
+        # Allocated once the dimension of the embeddings is known
+        self._vectors: Optional[np.ndarray] = None
+        self._contexts = np.zeros(max_entries, dtype=np.int64)
+        self._expires = np.zeros(max_entries)
+        self._last_used = np.zeros(max_entries)
+        # (question, response JSON) of each row
+        self._entries: List[Optional[Tuple[str, str]]] = [None] * max_entries
+        # (context, vector, question) of the pending turn
+        self._pending: PendingCalls[Tuple[int, np.ndarray, str]] = PendingCalls()
+
+    async def _embed(self, text: str) -> Optional[np.ndarray]:
+        try:
+            vector = np.asarray(await self.embed(text), dtype=np.float32)
+        except Exception as e:
+            event_log.log("semantic_cache_failed", error=str(e))
+            return None
+        norm = np.linalg.norm(vector)
+        if not norm:
+            return None
+        if self._vectors is None or self._vectors.shape[1] != len(vector):
+            self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+            self._expires[:] = 0
+        return vector / norm
+
+    def _search(self, context: int, vector: np.ndarray) -> Tuple[int, float]:
+        candidates = np.flatnonzero((self._contexts == context) & (self._expires > time.monotonic()))
+        if not len(candidates):
+            return -1, 0.0
+        similarities = self._vectors[candidates] @ vector
+        best = int(np.argmax(similarities))
+        return int(candidates[best]), float(similarities[best])
+
+    async def lookup(self, callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+        if callback_context._invocation_context.user_id in self.opt_out_users:
+            return None
+        question = last_user_message(llm_request)
+        if not question:
+            return None
+
+        vector = await self._embed(question)
+        if vector is None:
+            return None
+        context = request_context(llm_request)
+
+        row, similarity = self._search(context, vector)
+        if row >= 0:
+            metrics.observe("agent_semantic_cache_similarity", similarity)
+        if row >= 0 and similarity >= self.threshold:
+            self._last_used[row] = time.monotonic()
+            cached_question, encoded = self._entries[row]
+            metrics.inc("agent_semantic_cache_requests_total", result="hit")
+            event_log.log(
+                "semantic_cache_hit", similarity=round(similarity, 4), question=question, cached_question=cached_question
+            )
+            return LlmResponse.model_validate_json(encoded)
+
+        metrics.inc("agent_semantic_cache_requests_total", result="miss")
+        if is_streaming(callback_context):
+            return None
+        self._pending.put(callback_context.invocation_id, (context, vector, question))
+        return None
+
+    def store(self, callback_context: CallbackContext, llm_response: LlmResponse) -> Optional[LlmResponse]:
+        if llm_response.partial:
+            return None
+        parts = (llm_response.content.parts if llm_response.content else None) or []
+        # Only the final answer of the turn is stored, responses calling tools come before it
+        if not llm_response.error_code and any(part.function_call for part in parts):
+            return None
+        pending = self._pending.pop(callback_context.invocation_id)
+        if pending is None or llm_response.error_code or not any(part.text for part in parts):
+            return None
+
+        context, vector, question = pending
+        now = time.monotonic()
+        row = int(np.argmin(np.where(self._expires > now, self._last_used, -np.inf)))
+        self._vectors[row] = vector
+        self._contexts[row] = context
+        self._expires[row] = now + self.ttl
+        self._last_used[row] = now
+        self._entries[row] = (question, llm_response.model_dump_json(exclude_none=True))
+        return None
+
+    def stats(self) -> Dict[str, float]:
+        return {"entries": int(np.count_nonzero(self._expires > time.monotonic()))}
+
+
+semantic_response_cache = SemanticResponseCache(
+    embed=gemini_embedder(config.semantic_cache_embedding_model),
+    threshold=config.semantic_cache_threshold,
+    max_entries=config.semantic_cache_max_entries,
+    ttl=config.semantic_cache_ttl,
+    opt_out_users=parse_list(config.llm_cache_opt_out),
+)
+metrics.describe("agent_semantic_cache_requests_total", "Lookups of the semantic response cache by result")
+metrics.describe(
+    "agent_semantic_cache_similarity",
+    "Similarity of the closest cached question, for tuning the threshold",
+    buckets=SIMILARITY_BUCKETS,
+)
+metrics.register_gauges(
+    "agent_semantic_cache", semantic_response_cache.stats, help="Size of the semantic response cache"
+)
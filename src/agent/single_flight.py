@@ -0,0 +1,53 @@
+import asyncio
+
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from google.adk.tools.base_tool import BaseTool, ToolContext
+
+from core.config import config, parse_list
+from core.metrics import metrics
+
+from .tool_cache import canonical_args
+from .tool_guard import tool_guard
+
+Execute = Callable[[BaseTool, Dict[str, Any], ToolContext], Awaitable[Any]]
+
+
+async def _run_tool(tool: BaseTool, args: Dict[str, Any], tool_context: ToolContext) -> Any:
+    return await tool.run_async(args=args, tool_context=tool_context)
+
+
+class SingleFlight:
+    """Runs concurrent identical calls of idempotent tools only once.
+
+    Tools are run by call, defaulting to their run_async. Calls of the listed tools run
+    in a task shared by every call with the same tool name and canonical args started
+    while it is in flight. The call is not cancelled when the turn that started it is,
+    the other turns still wait on it.
+    """
+
+    def __init__(self, tools: Iterable[str], call: Optional[Execute] = None):
+        self.tools = set(tools)
+        self.call = call or _run_tool
+        self._in_flight: Dict[Tuple[str, str], asyncio.Task] = {}
+
+    async def run(self, tool: BaseTool, args: Dict[str, Any], tool_context: ToolContext) -> Any:
+        if tool.name not in self.tools:
+            return await self.call(tool, args, tool_context)
+
+        key = (tool.name, canonical_args(args))
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self.call(tool, args, tool_context))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            metrics.inc("agent_tool_coalesced_total", tool=tool.name)
+        return await asyncio.shield(task)
+
+
+single_flight = SingleFlight(
+    parse_list(config.tool_coalesce),
+    call=tool_guard.call,
+)
+metrics.describe("agent_tool_coalesced_total", "Tool calls that waited on an identical call in flight")
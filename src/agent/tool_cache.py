@@ -0,0 +1,104 @@
+import json
+import time
+
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from google.adk.tools.base_tool import BaseTool, ToolContext
+
+from core.config import config, parse_values
+from core.event_log import to_json
+from core.metrics import metrics
+
+from .pending import PendingCalls
+
+
+def canonical_args(args: Dict[str, Any]) -> str:
+    """Encodes the args independently of key order and whitespace."""
+    return json.dumps(args, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+class ToolResultCache:
+    """Caches the results of idempotent tools, keyed by tool name and canonical args.
+
+    Only tools listed in ttls are cached, each for its own number of seconds. Results are
+    stored JSON-encoded so every hit returns a fresh dict, and the least recently used
+    entries are evicted once the encoded results exceed max_bytes, error results are never
+    stored. lookup is registered
+    as a before-tool callback after the callbacks that may skip the tool, store as the
+    last after-tool callback, so only results of calls that actually ran are stored.
+    """
+
+    def __init__(self, ttls: Dict[str, float], max_bytes: int = 16 * 1024 * 1024):
+        self.ttls = ttls
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.evicted = 0
+        # key -> (expires at, encoded result)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, bytes]]" = OrderedDict()
+        # Key of each cacheable call that missed
+        self._pending: PendingCalls[Tuple[str, str]] = PendingCalls()
+
+    def lookup(self, tool: BaseTool, args: Dict[str, Any], tool_context: ToolContext) -> Optional[Dict]:
+        if tool.name not in self.ttls:
+            return None
+
+        key = (tool.name, canonical_args(args))
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, encoded = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                metrics.inc("agent_tool_cache_requests_total", tool=tool.name, result="hit")
+                return json.loads(encoded)
+            self._remove(key)
+
+        metrics.inc("agent_tool_cache_requests_total", tool=tool.name, result="miss")
+        self._pending.put(tool_context.invocation_id, key, tool_context.function_call_id)
+        return None
+
+    def contains(self, tool_name: str, args: Dict[str, Any]) -> bool:
+        """Tells whether a lookup would hit, without counting it."""
+        entry = self._entries.get((tool_name, canonical_args(args)))
+        return entry is not None and entry[0] > time.monotonic()
+
+    def store(
+        self, tool: BaseTool, args: Dict[str, Any], tool_context: ToolContext, tool_response: Any
+    ) -> Optional[Dict]:
+        key = self._pending.pop(tool_context.invocation_id, tool_context.function_call_id)
+        if key is None:
+            return None
+
+        # Responses that are not dicts are wrapped the way ADK wraps them in the event
+        response = tool_response if isinstance(tool_response, dict) else {"result": tool_response}
+        if "error" in response:
+            return None
+        encoded = json.dumps(response, ensure_ascii=False, default=to_json).encode()
+        result = json.loads(encoded)
+        if getattr(tool_response, "isError", False) or len(encoded) > self.max_bytes:
+            return result
+
+        self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttls[tool.name], encoded)
+        self.size_bytes += len(encoded)
+        while self.size_bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evicted += 1
+        # Return the encoded form so the first result matches the cached ones
+        return result
+
+    def _remove(self, key: Tuple[str, str]):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size_bytes -= len(entry[1])
+
+    def stats(self) -> Dict[str, float]:
+        return {"entries": len(self._entries), "bytes": self.size_bytes, "evicted": self.evicted}
+
+
+tool_result_cache = ToolResultCache(
+    ttls=parse_values(config.tool_cache_ttls),
+    max_bytes=config.tool_cache_max_bytes,
+)
+metrics.describe("agent_tool_cache_requests_total", "Lookups of the tool result cache by tool and result")
+metrics.register_gauges("agent_tool_cache", tool_result_cache.stats, help="Size of the tool result cache")
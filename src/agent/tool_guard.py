@@ -0,0 +1,149 @@
+import asyncio
+import time
+
+from typing import Any, Dict, Optional
+
+from google.adk.tools.base_tool import BaseTool, ToolContext
+
+from core.config import config, parse_values
+from core.event_log import event_log
+from core.metrics import metrics
+
+from .pending import PendingCalls
+
+
+class CircuitBreaker:
+    """Opens after max_failures failed or slow calls in a row.
+
+    While open, calls are refused for reset_timeout seconds, then a single trial call is
+    let through every reset_timeout seconds: the breaker closes if it succeeds and opens
+    again if it fails.
+    """
+
+    def __init__(self, max_failures: int = 5, reset_timeout: float = 30):
+        self.max_failures = max_failures
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_started_at: Optional[float] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        now = time.monotonic()
+        if now - self.opened_at < self.reset_timeout:
+            return False
+        # A trial whose call never completed, e.g. cancelled, is replaced after reset_timeout
+        if self.trial_started_at is not None and now - self.trial_started_at < self.reset_timeout:
+            return False
+        self.trial_started_at = now
+        return True
+
+    def record(self, success: bool) -> bool:
+        """Records a call, returns True when it opened the breaker."""
+        self.trial_started_at = None
+        if success:
+            self.failures = 0
+            self.opened_at = None
+            return False
+
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.max_failures:
+            opened = self.opened_at is None
+            self.opened_at = time.monotonic()
+            return opened
+        return False
+
+
+class ToolGuard:
+    """Bounds the time tool calls take and stops calling tools that keep failing.
+
+    call runs a tool within its deadline from timeouts, falling back to default_timeout,
+    and answers with a fallback error result when it fails or times out. Calls failing,
+    timing out or taking longer than slow_call seconds count against the circuit breaker
+    of the tool. before is a before-tool callback answering with the fallback result
+    while the breaker of the tool is open.
+    """
+
+    def __init__(
+        self,
+        default_timeout: float = 30,
+        timeouts: Optional[Dict[str, float]] = None,
+        slow_call: float = 10,
+        max_failures: int = 5,
+        reset_timeout: float = 30,
+    ):
+        self.default_timeout = default_timeout
+        self.timeouts = timeouts or {}
+        self.slow_call = slow_call
+        self.max_failures = max_failures
+        self.reset_timeout = reset_timeout
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        # Whether each call checked was let through
+        self._allowed: PendingCalls[bool] = PendingCalls()
+
+    def _breaker(self, tool_name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(tool_name)
+        if breaker is None:
+            breaker = self._breakers[tool_name] = CircuitBreaker(self.max_failures, self.reset_timeout)
+        return breaker
+
+    def allow_call(self, tool_name: str, tool_context: ToolContext) -> bool:
+        """Tells whether the breaker lets the call through, with the same answer on every check of it.
+
+        A half-open breaker lets a single trial call through, checking that call again,
+        e.g. from the parallel tool runner and then from before, must not refuse it.
+        """
+        allowed = self._allowed.get(tool_context.invocation_id, tool_context.function_call_id)
+        if allowed is None:
+            allowed = self._breaker(tool_name).allow()
+            self._allowed.put(tool_context.invocation_id, allowed, tool_context.function_call_id)
+        return allowed
+
+    def fallback(self, tool_name: str, reason: str) -> Dict[str, str]:
+        metrics.inc("agent_tool_fallbacks_total", tool=tool_name, reason=reason)
+        return {"error": f"Tool {tool_name} is temporarily unavailable ({reason}), answer without it"}
+
+    def before(self, tool: BaseTool, args: Dict[str, Any], tool_context: ToolContext) -> Optional[Dict]:
+        if not self.allow_call(tool.name, tool_context):
+            return self.fallback(tool.name, "circuit open")
+        return None
+
+    async def call(self, tool: BaseTool, args: Dict[str, Any], tool_context: ToolContext) -> Any:
+        timeout = self.timeouts.get(tool.name, self.default_timeout)
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(tool.run_async(args=args, tool_context=tool_context), timeout or None)
+        except asyncio.TimeoutError:
+            self._record(tool.name, False, "timeout")
+            return self.fallback(tool.name, "timeout")
+        except Exception as e:
+            event_log.log("tool_failed", tool=tool.name, error=str(e))
+            self._record(tool.name, False, "error")
+            return self.fallback(tool.name, "error")
+
+        slow = self.slow_call > 0 and time.perf_counter() - start > self.slow_call
+        self._record(tool.name, not slow, "slow call")
+        return result
+
+    def _record(self, tool_name: str, success: bool, reason: str):
+        if self._breaker(tool_name).record(success):
+            event_log.log("tool_circuit_opened", tool=tool_name, reason=reason)
+
+    def stats(self) -> Dict[str, float]:
+        return {tool_name: int(breaker.is_open) for tool_name, breaker in self._breakers.items()}
+
+
+tool_guard = ToolGuard(
+    default_timeout=config.tool_timeout,
+    timeouts=parse_values(config.tool_timeouts),
+    slow_call=config.tool_breaker_slow_call,
+    max_failures=config.tool_breaker_failures,
+    reset_timeout=config.tool_breaker_reset,
+)
+metrics.describe("agent_tool_fallbacks_total", "Tool calls answered with a fallback result by tool and reason")
+metrics.register_gauges("agent_tool_circuit_open", tool_guard.stats, help="1 while the circuit breaker of the tool is open")
@@ -0,0 +1,47 @@
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from google.genai import types
+
+
+class ToolVariants:
+    """Caches the tool lists of the request config with some functions left out.
+
+    ADK rebuilds the tool list on every model call from the declarations cached by the
+    tool registry, so a variant is keyed by the identity of those declarations and the
+    excluded names. Variants are built once and shared, callers must not modify them.
+    """
+
+    def __init__(self, max_variants: int = 64):
+        self.max_variants = max_variants
+        # key -> (declarations the variant was built from, variant)
+        self._variants: Dict[Tuple[Tuple[int, ...], FrozenSet[str]], Tuple[tuple, List[types.Tool]]] = {}
+
+    def select(self, tools: Optional[List[types.Tool]], excluded: FrozenSet[str]) -> Optional[List[types.Tool]]:
+        if not tools or not excluded:
+            return tools
+
+        declarations = tuple(
+            declaration for tool in tools for declaration in tool.function_declarations or []
+        )
+        key = (tuple(map(id, declarations)), excluded)
+        cached = self._variants.get(key)
+        # Ids of freed declarations can be reused, the variant must come from the same objects
+        if cached is not None and all(a is b for a, b in zip(cached[0], declarations)):
+            return cached[1]
+
+        variant = []
+        for tool in tools:
+            if not tool.function_declarations:
+                variant.append(tool)
+                continue
+            kept = [declaration for declaration in tool.function_declarations if declaration.name not in excluded]
+            if kept:
+                variant.append(tool.model_copy(update={"function_declarations": kept}))
+
+        if len(self._variants) >= self.max_variants:
+            self._variants.clear()
+        self._variants[key] = (declarations, variant)
+        return variant
+
+
+tool_variants = ToolVariants()
@@ -0,0 +1,102 @@
+import gc
+import time
+
+from typing import Dict
+
+from google.adk.models import Gemini, LlmRequest
+from google.genai import types
+
+from core.config import config
+from core.event_log import event_log
+from core.metrics import metrics
+
+from .agent import get_tool_registry, resolve_model_class
+from .model_router import ModelRouter
+from .runner_pool import RunnerPool
+
+_ready = False
+
+
+def is_ready() -> bool:
+    """Tells whether the warmup completed and requests are served warm."""
+    return _ready
+
+
+def pre_fork_warmup():
+    """Loads in the parent process what every worker would otherwise load at startup.
+
+    Runs before the workers are forked, so it must not open connections or start threads.
+    """
+    import anyio._backends._asyncio  # noqa: F401
+    import h11  # noqa: F401
+    import httpcore  # noqa: F401
+
+    if any(name and resolve_model_class(name) is None for name in (config.agent_model, config.router_small_model)):
+        import google.adk.models.lite_llm  # noqa: F401
+
+    # Objects surviving until the fork are never collected, so the garbage collector does
+    # not write to their pages and the workers keep sharing them
+    gc.collect()
+    gc.freeze()
+
+
+async def warm_up(runner_pool: RunnerPool, probe: bool = False) -> Dict[str, float]:
+    """Builds the default runner and primes the MCP and model connections.
+
+    With probe, a one-token model request is sent so the first user request does not pay
+    for any lazy initialization of the model path. Building the runner has to succeed,
+    failing priming steps are only logged. Returns the duration of every step.
+    """
+    global _ready
+    durations: Dict[str, float] = {}
+
+    async def step(name: str, action, required: bool = False):
+        start = time.perf_counter()
+        try:
+            await action()
+        except Exception as e:
+            event_log.log("warmup_failed", step=name, error=str(e))
+            if required:
+                raise
+        finally:
+            durations[name] = time.perf_counter() - start
+            metrics.observe("agent_warmup_duration_seconds", durations[name], step=name)
+
+    await step("runner", runner_pool.warm, required=True)
+
+    async def prime_tools():
+        tool_registry = get_tool_registry()
+        if tool_registry is not None:
+            await tool_registry.get_tools()
+
+    await step("tools", prime_tools)
+
+    runner = await runner_pool.get()
+    llm = runner.agent.canonical_model
+
+    async def prime_model_client():
+        # Opens the TLS connection of the client's pool with a request free of tokens
+        for model in [llm.small, llm.large] if isinstance(llm, ModelRouter) else [llm]:
+            if isinstance(model, Gemini):
+                await model.api_client.aio.models.get(model=model.model)
+
+    await step("model_client", prime_model_client)
+
+    async def send_probe():
+        llm_request = LlmRequest(
+            model=llm.model,
+            contents=[types.Content(role="user", parts=[types.Part(text="ping")])],
+            config=types.GenerateContentConfig(max_output_tokens=1),
+        )
+        async for _ in llm.generate_content_async(llm_request):
+            pass
+
+    if probe:
+        await step("probe", send_probe)
+
+    _ready = True
+    event_log.log("warmup_done", durations=durations)
+    return durations
+
+
+metrics.describe("agent_warmup_duration_seconds", "Duration of each startup warmup step")
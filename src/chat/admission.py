@@ -0,0 +1,157 @@
+import asyncio
+import math
+import time
+
+from typing import Callable, Dict, Optional
+
+from core.config import config, parse_values
+from core.metrics import metrics
+
+from .scheduler import FairQueue
+
+Release = Callable[[], None]
+
+
+class Rejected(Exception):
+    """A request turned away, to be answered with its status code and Retry-After seconds."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounds the chat turns running at once, globally and per user.
+
+    A user already running max_per_user turns is rejected with 429 straight away. Past
+    max_concurrent turns, requests wait in a queue of at most max_queue entries for at
+    most queue_timeout seconds, and are rejected with 503 when the queue is full or the
+    wait times out. A finishing turn hands its slot to the next waiter, picked fairly
+    across users with the weight of the waiter's priority tier. Limits of 0 are disabled.
+    Raises ValueError for a weight that is not positive or an unknown default tier.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 0,
+        max_per_user: int = 0,
+        max_queue: int = 0,
+        queue_timeout: float = 10,
+        priority_weights: Optional[Dict[str, float]] = None,
+        default_priority: str = "normal",
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_per_user = max_per_user
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.priority_weights = priority_weights or {default_priority: 1.0}
+        self.default_priority = default_priority
+        for priority, weight in self.priority_weights.items():
+            if weight <= 0:
+                raise ValueError(f"Weight of priority tier {priority} must be positive, got {weight}")
+        if default_priority not in self.priority_weights:
+            raise ValueError(f"Default priority tier {default_priority} has no weight")
+        self._active = 0
+        self._users: Dict[str, int] = {}
+        self._waiters = FairQueue()
+        self._queued: Dict[str, int] = dict.fromkeys(self.priority_weights, 0)
+        # Moving average of the turn duration, estimates when a slot frees up
+        self._turn_seconds = 1.0
+
+    def _retry_after(self, turns_ahead: int) -> int:
+        slots = self.max_concurrent or 1
+        return max(1, math.ceil(self._turn_seconds * (turns_ahead // slots + 1)))
+
+    def _reject(self, status_code: int, reason: str, turns_ahead: int):
+        metrics.inc("agent_admission_requests_total", result="rejected", reason=reason)
+        raise Rejected(status_code, reason, self._retry_after(turns_ahead))
+
+    def _free_slot(self):
+        waiter = self._waiters.pop()
+        if waiter is not None:
+            waiter.set_result(None)
+        else:
+            self._active -= 1
+
+    async def _wait_for_slot(self, user_id: str, priority: str):
+        if self.max_queue and len(self._waiters) >= self.max_queue:
+            self._reject(503, "queue_full", len(self._waiters))
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.push(user_id, self.priority_weights[priority], waiter)
+        self._queued[priority] += 1
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            # The slot was handed over while the wait was interrupted
+            if not self._waiters.remove(waiter) and waiter.done() and not waiter.cancelled():
+                self._free_slot()
+            metrics.observe("agent_admission_wait_seconds", time.perf_counter() - start, priority=priority)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self._reject(503, "queue_timeout", len(self._waiters))
+        finally:
+            self._queued[priority] -= 1
+        metrics.observe("agent_admission_wait_seconds", time.perf_counter() - start, priority=priority)
+
+    async def acquire(self, user_id: str, priority: Optional[str] = None) -> Release:
+        """Waits for a slot for a turn of the user, returns the function releasing it.
+
+        Unknown priority tiers are treated as the default one. Raises Rejected when the
+        turn is not admitted.
+        """
+        if priority not in self.priority_weights:
+            priority = self.default_priority
+        if self.max_per_user and self._users.get(user_id, 0) >= self.max_per_user:
+            self._reject(429, "user_limit", 0)
+
+        self._users[user_id] = self._users.get(user_id, 0) + 1
+        try:
+            if self.max_concurrent and (self._active >= self.max_concurrent or len(self._waiters)):
+                await self._wait_for_slot(user_id, priority)
+            else:
+                self._active += 1
+        except BaseException:
+            self._release_user(user_id)
+            raise
+        metrics.inc("agent_admission_requests_total", result="admitted")
+
+        admitted_at = time.monotonic()
+        released = False
+
+        def release():
+            nonlocal released
+            if released:
+                return
+            released = True
+            self._turn_seconds = 0.9 * self._turn_seconds + 0.1 * (time.monotonic() - admitted_at)
+            self._release_user(user_id)
+            self._free_slot()
+
+        return release
+
+    def _release_user(self, user_id: str):
+        self._users[user_id] -= 1
+        if not self._users[user_id]:
+            del self._users[user_id]
+
+    def stats(self) -> Dict[str, float]:
+        stats = {"active": self._active, "queued": len(self._waiters), "users": len(self._users)}
+        stats.update({f"queued_{priority}": queued for priority, queued in self._queued.items()})
+        return stats
+
+
+admission = AdmissionController(
+    max_concurrent=config.chat_max_concurrency,
+    max_per_user=config.chat_max_concurrency_per_user,
+    max_queue=config.chat_max_queue,
+    queue_timeout=config.chat_queue_timeout,
+    priority_weights=parse_values(config.chat_priority_weights),
+    default_priority=config.chat_default_priority,
+)
+metrics.describe("agent_admission_requests_total", "Chat turns admitted or rejected, by rejection reason")
+metrics.describe("agent_admission_wait_seconds", "Time chat turns waited in the admission queue, by priority tier")
+metrics.register_gauges("agent_admission", admission.stats, help="Running and queued chat turns")
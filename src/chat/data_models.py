@@ -1,3 +1,5 @@
+from typing import Any, Dict, Optional
+
 from pydantic import BaseModel, Field
 
 class MessageRequest(BaseModel):
@@ -5,6 +7,15 @@ class MessageRequest(BaseModel):
     session_id: str = Field(description="ID of the session the message belongs to")
     message: str = Field(description="Content of the message being sent")
     use_rag: bool = Field(default=False, description="If True, agent will search context in Knowledge Base")
+    priority: Optional[str] = Field(default=None, description="Priority tier of the request, weighting its turn when queued")
 
 class MessageResponse(BaseModel):
-    response: str
\ No newline at end of file
+    response: str
+
+class StreamEvent(BaseModel):
+    type: str = Field(description="Kind of event: text, tool_call, tool_result, final or error")
+    session_id: Optional[str] = Field(default=None, description="Session the event belongs to, set on multiplexed channels")
+    author: Optional[str] = Field(default=None, description="Author of the underlying agent event")
+    text: Optional[str] = Field(default=None, description="Partial or final text produced by the model")
+    name: Optional[str] = Field(default=None, description="Name of the tool being called or returning")
+    data: Optional[Dict[str, Any]] = Field(default=None, description="Tool call arguments or tool result")
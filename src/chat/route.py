@@ -1,27 +1,36 @@
+import asyncio
 import time
 
 from enum import Enum
 
-from typing import Optional
+from typing import AsyncGenerator, Dict, List, Optional, Set, Tuple
 
-from fastapi import HTTPException
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from google.genai import types
-from google.adk.agents import Agent
+from google.adk.agents.run_config import RunConfig, StreamingMode
 from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
+from google.adk.sessions import BaseSessionService, Session
 from google.adk.events import Event, EventActions
 
 from fastapi import APIRouter
+from pydantic import ValidationError
 
-from chat.data_models import MessageRequest, MessageResponse
-from agent import get_agent
+from core.config import config
+from core.event_log import event_log
+from core.metrics import metrics
+from chat.admission import Release, Rejected, admission
+from chat.data_models import MessageRequest, MessageResponse, StreamEvent
+from agent import RunnerPool
+from agent.warmup import warm_up
+from session import BoundedSessionService, SqliteSessionService
 
 router = APIRouter()
 
 # Global variables
-agent: Optional[Agent] = None
-runner: Optional[Runner] = None
-session_service: Optional[InMemorySessionService] = None
+runner_pool: Optional[RunnerPool] = None
+session_service: Optional[BaseSessionService] = None
 
 app_name = "Tooling Agent"
 
@@ -30,45 +39,62 @@ class Role(str, Enum):
 
 @router.on_event("startup")
 async def startup_event():
-    global agent, session_service
-    agent = await get_agent()
-    session_service = InMemorySessionService()
+    global runner_pool, session_service
+    if runner_pool is not None:
+        return
 
-@router.post("/chat", response_model=MessageResponse)
-async def send_message(
-    input_data: MessageRequest
-):
-    global agent, runner, session_service
-    
-    if agent is None:
-        raise HTTPException(status_code=500, detail="Agent not initialized")
-    
-    if runner is None:
-        runner = Runner(
-            agent=agent,
-            app_name=app_name,
-            session_service=session_service
+    if config.session_backend == "sqlite":
+        session_service = SqliteSessionService(
+            db_path=config.session_db_path,
+            max_loaded_events=config.session_max_events
+        )
+    else:
+        session_service = BoundedSessionService(
+            max_sessions=config.session_max_sessions,
+            max_events_per_session=config.session_max_events,
+            idle_ttl=config.session_idle_ttl,
+            num_shards=config.session_shards
+        )
+        metrics.register_gauges(
+            "agent_session_store",
+            session_service.stats,
+            help="Stored sessions and eviction counters of the in-process session store"
         )
 
-    current_session = await runner.session_service.get_session(
-        app_name=app_name,
-        user_id=input_data.user_id,
-        session_id=input_data.session_id
-    )
-    if not current_session :
-        current_session = await runner.session_service.create_session(
+    runner_pool = RunnerPool(app_name=app_name, session_service=session_service)
+    await warm_up(runner_pool, probe=config.warmup_probe)
+
+@router.on_event("shutdown")
+async def shutdown_event():
+    if isinstance(session_service, SqliteSessionService):
+        await session_service.close()
+    event_log.close()
+
+async def get_runner() -> Runner:
+    """Returns the pooled runner of the default agent variant."""
+    if runner_pool is None:
+        raise HTTPException(status_code=500, detail="Agent not initialized")
+    return await runner_pool.get()
+
+async def admit(input_data: MessageRequest) -> Release:
+    """Waits for an admission slot for the turn, answering 429 or 503 when rejected."""
+    try:
+        return await admission.acquire(input_data.user_id, input_data.priority)
+    except Rejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.reason, headers={"Retry-After": str(e.retry_after)})
+
+async def prepare_session(
+    runner: Runner,
+    input_data: MessageRequest
+) -> Session:
+    """Gets or creates the session for the request and records the use_rag state."""
+    with metrics.time("agent_stage_duration_seconds", stage="session_lookup"):
+        current_session = await runner.session_service.get_session(
             app_name=app_name,
             user_id=input_data.user_id,
-            session_id=input_data.session_id,
-            state={
-                "user:use_rag": input_data.use_rag,
-            }
+            session_id=input_data.session_id
         )
-    else:
-        if current_session.state.get("user:use_rag", False) != input_data.use_rag:
-            print("Clear events due to user:use_rag change")
-            await runner.session_service.delete_session(app_name=app_name, user_id=input_data.user_id, session_id=input_data.session_id)
-            
+        if not current_session :
             current_session = await runner.session_service.create_session(
                 app_name=app_name,
                 user_id=input_data.user_id,
@@ -77,35 +103,251 @@ async def send_message(
                     "user:use_rag": input_data.use_rag,
                 }
             )
-    
+
+    timestamp = time.time()
     actions_with_update = EventActions(state_delta={
         "user:use_rag": input_data.use_rag,
     })
-    
+
+    # Toggling use_rag only records a state delta on the existing session. With the
+    # "scope" policy the model sees the turns from this point on, otherwise the whole history.
+    if (
+        current_session.state.get("user:use_rag", False) != input_data.use_rag
+        and config.rag_toggle_history == "scope"
+    ):
+        actions_with_update.state_delta["history_scope_start"] = timestamp
+
     system_event = Event(
         author="system",
         actions=actions_with_update,
-        timestamp=time.time()
+        timestamp=timestamp
     )
-    await runner.session_service.append_event(current_session, system_event)
+    with metrics.time("agent_stage_duration_seconds", stage="system_event_append"):
+        await runner.session_service.append_event(current_session, system_event)
+    return current_session
 
-    # Run the agent
-    events = [
-        event
-        async for event in runner.run_async(
-            user_id=input_data.user_id,
-            session_id=input_data.session_id,
-            new_message=types.Content(
-                role=Role.USER,
-                parts=[types.Part(text=input_data.message)]
-            )
+class StreamEventConverter:
+    """Converts the ADK events of one turn into the frames forwarded to streaming clients.
+
+    ADK marks every complete text response as final, also the text a model writes before
+    calling a tool. A complete response is held back until the next event: the turn's last
+    one is sent as the final frame, earlier ones as text frames unless their text was
+    already streamed in partial frames.
+    """
+
+    def __init__(self):
+        self._held: Optional[StreamEvent] = None
+        self._held_streamed = False
+        # Whether partial text was sent since the last complete response
+        self._streamed = False
+
+    def convert(self, event: Event) -> List[StreamEvent]:
+        stream_events = []
+        if self._held is not None:
+            if self._held.text and not self._held_streamed:
+                stream_events.append(StreamEvent(type="text", author=self._held.author, text=self._held.text))
+            self._held = None
+
+        text = "".join(
+            part.text
+            for part in (event.content.parts if event.content and event.content.parts else [])
+            if part.text
         )
-    ]
+        if event.partial:
+            if text:
+                stream_events.append(StreamEvent(type="text", author=event.author, text=text))
+                self._streamed = True
+        elif event.is_final_response():
+            self._held = StreamEvent(type="final", author=event.author, text=text)
+            self._held_streamed = self._streamed
+            self._streamed = False
+        else:
+            if text and not self._streamed:
+                stream_events.append(StreamEvent(type="text", author=event.author, text=text))
+            self._streamed = False
+
+        for function_call in event.get_function_calls():
+            stream_events.append(StreamEvent(
+                type="tool_call",
+                author=event.author,
+                name=function_call.name,
+                data=function_call.args or {}
+            ))
+
+        for function_response in event.get_function_responses():
+            stream_events.append(StreamEvent(
+                type="tool_result",
+                author=event.author,
+                name=function_response.name,
+                data=function_response.response or {}
+            ))
+
+        return stream_events
+
+    def finish(self) -> List[StreamEvent]:
+        """Returns the frames left once the turn ended, its final frame."""
+        held, self._held = self._held, None
+        return [held] if held is not None else []
+
+@router.post("/chat", response_model=MessageResponse)
+async def send_message(
+    input_data: MessageRequest
+):
+    runner = await get_runner()
+    release = await admit(input_data)
+    try:
+        await prepare_session(runner, input_data)
+
+        # Run the agent
+        with metrics.time("agent_stage_duration_seconds", stage="turn"):
+            events = [
+                event
+                async for event in runner.run_async(
+                    user_id=input_data.user_id,
+                    session_id=input_data.session_id,
+                    new_message=types.Content(
+                        role=Role.USER,
+                        parts=[types.Part(text=input_data.message)]
+                    )
+                )
+            ]
+    finally:
+        release()
 
     response_text = ""
     for event in events:
-        print(event)
+        event_log.log("agent_event", session_id=input_data.session_id, data=event)
         if event.is_final_response():
             response_text = event.content.parts[0].text
-    
-    return MessageResponse(response=response_text)
\ No newline at end of file
+
+    return MessageResponse(response=response_text)
+
+@router.post("/chat/stream")
+async def stream_message(
+    input_data: MessageRequest
+):
+    """Runs the agent and forwards partial text, tool calls and tool results as Server-Sent Events."""
+    runner = await get_runner()
+    release = await admit(input_data)
+    try:
+        await prepare_session(runner, input_data)
+    except BaseException:
+        release()
+        raise
+
+    async def event_generator() -> AsyncGenerator[str, None]:
+        start = time.perf_counter()
+        first_event = True
+        converter = StreamEventConverter()
+        try:
+            async for event in runner.run_async(
+                user_id=input_data.user_id,
+                session_id=input_data.session_id,
+                new_message=types.Content(
+                    role=Role.USER,
+                    parts=[types.Part(text=input_data.message)]
+                ),
+                run_config=RunConfig(streaming_mode=StreamingMode.SSE)
+            ):
+                if first_event:
+                    first_event = False
+                    metrics.observe("agent_stage_duration_seconds", time.perf_counter() - start, stage="first_event")
+                for stream_event in converter.convert(event):
+                    yield f"data: {stream_event.model_dump_json(exclude_none=True)}\n\n"
+            for stream_event in converter.finish():
+                yield f"data: {stream_event.model_dump_json(exclude_none=True)}\n\n"
+            metrics.observe("agent_stage_duration_seconds", time.perf_counter() - start, stage="turn")
+        except Exception as e:
+            error_event = StreamEvent(type="error", text=str(e))
+            yield f"data: {error_event.model_dump_json(exclude_none=True)}\n\n"
+        finally:
+            release()
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Releases the slot when the stream never started, release is idempotent
+        background=BackgroundTask(release)
+    )
+
+@router.websocket("/chat/ws")
+async def chat_websocket(websocket: WebSocket):
+    """Multiplexes chat turns for several sessions over one connection.
+
+    Every incoming text frame is a MessageRequest. Turns of different sessions run
+    concurrently, turns of the same session run in order, and every outgoing
+    StreamEvent frame carries the session_id it belongs to.
+    """
+    await websocket.accept()
+
+    if runner_pool is None:
+        await websocket.close(code=1011, reason="Agent not initialized")
+        return
+
+    runner = await get_runner()
+    session_locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+    send_lock = asyncio.Lock()
+    tasks: Set[asyncio.Task] = set()
+
+    async def send(stream_event: StreamEvent):
+        async with send_lock:
+            await websocket.send_text(stream_event.model_dump_json(exclude_none=True))
+
+    async def run_turn(input_data: MessageRequest):
+        key = (input_data.user_id, input_data.session_id)
+        async with session_locks.setdefault(key, asyncio.Lock()):
+            try:
+                release = await admission.acquire(input_data.user_id, input_data.priority)
+            except Rejected as e:
+                await send(StreamEvent(
+                    type="error",
+                    session_id=input_data.session_id,
+                    text=e.reason,
+                    data={"status": e.status_code, "retry_after": e.retry_after}
+                ))
+                return
+            start = time.perf_counter()
+            converter = StreamEventConverter()
+            try:
+                await prepare_session(runner, input_data)
+                async for event in runner.run_async(
+                    user_id=input_data.user_id,
+                    session_id=input_data.session_id,
+                    new_message=types.Content(
+                        role=Role.USER,
+                        parts=[types.Part(text=input_data.message)]
+                    ),
+                    run_config=RunConfig(streaming_mode=StreamingMode.SSE)
+                ):
+                    for stream_event in converter.convert(event):
+                        stream_event.session_id = input_data.session_id
+                        await send(stream_event)
+                for stream_event in converter.finish():
+                    stream_event.session_id = input_data.session_id
+                    await send(stream_event)
+                metrics.observe("agent_stage_duration_seconds", time.perf_counter() - start, stage="turn")
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                await send(StreamEvent(type="error", session_id=input_data.session_id, text=str(e)))
+            finally:
+                release()
+
+    try:
+        while True:
+            raw_message = await websocket.receive_text()
+            try:
+                input_data = MessageRequest.model_validate_json(raw_message)
+            except ValidationError as e:
+                await send(StreamEvent(type="error", text=str(e)))
+                continue
+
+            task = asyncio.create_task(run_turn(input_data))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in tasks:
+            task.cancel()
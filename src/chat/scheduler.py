@@ -0,0 +1,54 @@
+import asyncio
+import heapq
+import itertools
+
+from typing import Dict, List, Optional, Tuple
+
+
+class FairQueue:
+    """Waiters for a slot, served by weighted-fair queuing across users.
+
+    Every waiter gets a virtual finish tag: the later of the current virtual time and the
+    tag of the previous waiter of its user, plus 1 / weight. Waiters are served by
+    increasing tag, so a user with many queued turns gets spaced out tags and a user
+    arriving with a single turn is served before the rest of that backlog. A higher weight
+    makes a user's turns come around proportionally more often.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, str, asyncio.Future]] = []
+        self._order = itertools.count()
+        # Tag of the last queued waiter of each user
+        self._finish: Dict[str, float] = {}
+        self._virtual_time = 0.0
+
+    def push(self, user_id: str, weight: float, waiter: asyncio.Future):
+        finish = max(self._virtual_time, self._finish.get(user_id, 0.0)) + 1 / weight
+        self._finish[user_id] = finish
+        heapq.heappush(self._heap, (finish, next(self._order), user_id, waiter))
+
+    def pop(self) -> Optional[asyncio.Future]:
+        """Removes and returns the next waiter still waiting, None when there is none."""
+        while self._heap:
+            finish, _, user_id, waiter = heapq.heappop(self._heap)
+            self._virtual_time = finish
+            if self._finish.get(user_id) == finish:
+                del self._finish[user_id]
+            if not waiter.done():
+                return waiter
+        return None
+
+    def remove(self, waiter: asyncio.Future) -> bool:
+        """Removes a waiter giving up, returns False when it was already served."""
+        for index, (finish, _, user_id, queued) in enumerate(self._heap):
+            if queued is waiter:
+                self._heap[index] = self._heap[-1]
+                self._heap.pop()
+                heapq.heapify(self._heap)
+                if self._finish.get(user_id) == finish:
+                    del self._finish[user_id]
+                return True
+        return False
+
+    def __len__(self) -> int:
+        return len(self._heap)
@@ -1,3 +1,133 @@
+import os
+
+from typing import Dict, List
+
+
+def parse_list(value: str) -> List[str]:
+    """Parses a "a,b,..." setting, skipping empty items."""
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def parse_values(value: str) -> Dict[str, float]:
+    """Parses a "name=value,..." setting, skipping items without a value."""
+    values = {}
+    for item in parse_list(value):
+        if "=" in item:
+            name, number = item.split("=", 1)
+            values[name.strip()] = float(number)
+    return values
+
+
 class Config:
     def __init__(self):
-        ...
\ No newline at end of file
+        # Model of the default agent: a Gemini model name, or a name ADK does not know served through LiteLLM
+        self.agent_model = os.getenv("AGENT_MODEL", "gemini-2.5-flash-preview-05-20")
+        # Simple turns go to router_small_model instead, when set. A turn is simple unless its
+        # message is longer than router_max_message_chars, the conversation longer than
+        # router_max_context_tokens, the message has one of router_complex_keywords, or it
+        # continues after tool calls
+        self.router_small_model = os.getenv("ROUTER_SMALL_MODEL", "")
+        self.router_max_message_chars = int(os.getenv("ROUTER_MAX_MESSAGE_CHARS", "200"))
+        self.router_max_context_tokens = int(os.getenv("ROUTER_MAX_CONTEXT_TOKENS", "2000"))
+        self.router_complex_keywords = os.getenv(
+            "ROUTER_COMPLEX_KEYWORDS", "why,how,explain,compare,analyze,summarize,document,documents"
+        )
+        # Send a one-token request to the model during the startup warmup
+        self.warmup_probe = os.getenv("WARMUP_PROBE", "false").lower() == "true"
+
+        # MCP server providing the agent tools, its tool list is checked for changes every
+        # tool_refresh_interval seconds, 0 only refreshes on /update-toolset
+        self.mcp_server_url = os.getenv("MCP_SERVER_URL", "http://127.0.0.1:17324/mcp-server/sse")
+        self.tool_refresh_interval = float(os.getenv("TOOL_REFRESH_INTERVAL", "60"))
+        # After /update-toolset swaps in a new connection, the old one is closed once idle,
+        # waiting at least toolset_drain_grace and at most toolset_drain_timeout seconds
+        self.toolset_drain_grace = float(os.getenv("TOOLSET_DRAIN_GRACE", "5"))
+        self.toolset_drain_timeout = float(os.getenv("TOOLSET_DRAIN_TIMEOUT", "60"))
+
+        # Tool calls are spread over mcp_pool_size sessions to the MCP server, idle sessions
+        # are pinged every mcp_health_interval seconds and reconnected with backoff on failure
+        self.mcp_pool_size = int(os.getenv("MCP_POOL_SIZE", "4"))
+        self.mcp_health_interval = float(os.getenv("MCP_HEALTH_INTERVAL", "15"))
+        self.mcp_reconnect_max_backoff = float(os.getenv("MCP_RECONNECT_MAX_BACKOFF", "30"))
+
+        # Results of the idempotent tools listed as "tool=ttl seconds" are cached,
+        # evicting the least recently used ones above tool_cache_max_bytes
+        self.tool_cache_ttls = os.getenv("TOOL_CACHE_TTLS", "semantic_search=300,keyword_search=300")
+        self.tool_cache_max_bytes = int(os.getenv("TOOL_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+        # Idempotent tools: concurrent identical calls share a single call, and a call failing on a
+        # dropped MCP connection is retried on another one
+        self.tool_coalesce = os.getenv("TOOL_COALESCE", "semantic_search,keyword_search")
+        # Function calls of one model response run concurrently, at most tool_parallelism at a time
+        self.tool_parallelism = int(os.getenv("TOOL_PARALLELISM", "4"))
+
+        # Tool calls time out after tool_timeout seconds, or the "tool=seconds" of tool_timeouts.
+        # The circuit breaker of a tool opens after tool_breaker_failures failed calls in a row,
+        # calls slower than tool_breaker_slow_call seconds count as failed, and lets a trial
+        # call through every tool_breaker_reset seconds
+        self.tool_timeout = float(os.getenv("TOOL_TIMEOUT", "30"))
+        self.tool_timeouts = os.getenv("TOOL_TIMEOUTS", "")
+        self.tool_breaker_failures = int(os.getenv("TOOL_BREAKER_FAILURES", "5"))
+        self.tool_breaker_slow_call = float(os.getenv("TOOL_BREAKER_SLOW_CALL", "10"))
+        self.tool_breaker_reset = float(os.getenv("TOOL_BREAKER_RESET", "30"))
+
+        # Model requests identical to one answered in the last llm_cache_ttl seconds get the same
+        # response, keeping at most llm_cache_max_entries of them. 0 disables the cache, and the
+        # comma-separated user ids of llm_cache_opt_out never use it
+        self.llm_cache_ttl = float(os.getenv("LLM_CACHE_TTL", "300"))
+        self.llm_cache_max_entries = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+        self.llm_cache_opt_out = os.getenv("LLM_CACHE_OPT_OUT", "")
+        # Paraphrased questions asked in the same context get the answer of the earlier question
+        # when their embeddings are at least semantic_cache_threshold similar. Embedding every
+        # question costs a request to semantic_cache_embedding_model, so it is off by default
+        self.semantic_cache_enabled = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+        self.semantic_cache_embedding_model = os.getenv("SEMANTIC_CACHE_EMBEDDING_MODEL", "text-embedding-004")
+        self.semantic_cache_threshold = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+        self.semantic_cache_max_entries = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "10000"))
+        self.semantic_cache_ttl = float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+
+        # History the model sees after use_rag is toggled on a session:
+        # "keep" sends the whole conversation, "scope" only the turns since the toggle.
+        self.rag_toggle_history = os.getenv("RAG_TOGGLE_HISTORY", "keep")
+        # Hide the retrieval tools from the model while use_rag is off
+        self.rag_filter_tools = os.getenv("RAG_FILTER_TOOLS", "false").lower() == "true"
+
+        # Chat turns running at once in each worker, in total and per user_id. Turns past
+        # chat_max_concurrency wait in a queue of chat_max_queue for chat_queue_timeout seconds,
+        # others are rejected with 429 or 503 and Retry-After. 0 disables a limit
+        self.chat_max_concurrency = int(os.getenv("CHAT_MAX_CONCURRENCY", "64"))
+        self.chat_max_concurrency_per_user = int(os.getenv("CHAT_MAX_CONCURRENCY_PER_USER", "4"))
+        self.chat_max_queue = int(os.getenv("CHAT_MAX_QUEUE", "128"))
+        self.chat_queue_timeout = float(os.getenv("CHAT_QUEUE_TIMEOUT", "10"))
+        # Queued turns are served fairly across users, weighted by the priority tier of the
+        # request given as "tier=weight,...", requests without a known tier use the default one
+        self.chat_priority_weights = os.getenv("CHAT_PRIORITY_WEIGHTS", "high=4,normal=1,low=0.25")
+        self.chat_default_priority = os.getenv("CHAT_DEFAULT_PRIORITY", "normal")
+
+        # Worker processes forked by server.py, more than one needs the sqlite session backend
+        self.workers = int(os.getenv("WORKERS", "1"))
+
+        # Session backend: "memory" for the bounded in-process store, "sqlite" for a
+        # database file that survives restarts and is shared by the workers of one host
+        self.session_backend = os.getenv("SESSION_BACKEND", "memory")
+        self.session_db_path = os.getenv("SESSION_DB_PATH", "sessions.db")
+
+        # Bounds of the in-process session store
+        self.session_max_sessions = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+        self.session_max_events = int(os.getenv("SESSION_MAX_EVENTS", "200"))
+        self.session_idle_ttl = float(os.getenv("SESSION_IDLE_TTL", "3600"))
+        self.session_shards = int(os.getenv("SESSION_SHARDS", "16"))
+
+        # History compaction before model calls, a budget of 0 disables it
+        self.compaction_token_budget = int(os.getenv("COMPACTION_TOKEN_BUDGET", "8000"))
+        self.compaction_keep_turns = int(os.getenv("COMPACTION_KEEP_TURNS", "6"))
+        self.compaction_summary_chars = int(os.getenv("COMPACTION_SUMMARY_CHARS", "4000"))
+
+        # Structured event log, sample rates per event name are given as "name=rate,..."
+        self.event_log_enabled = os.getenv("EVENT_LOG_ENABLED", "true").lower() == "true"
+        self.event_log_sample_rate = float(os.getenv("EVENT_LOG_SAMPLE_RATE", "1.0"))
+        self.event_log_sample_rates = os.getenv("EVENT_LOG_SAMPLE_RATES", "model_request=0.1,agent_event=0.1")
+        self.event_log_max_field_chars = int(os.getenv("EVENT_LOG_MAX_FIELD_CHARS", "500"))
+        self.event_log_queue_size = int(os.getenv("EVENT_LOG_QUEUE_SIZE", "10000"))
+
+
+config = Config()
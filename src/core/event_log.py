@@ -0,0 +1,187 @@
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+from enum import Enum
+from typing import Any, Dict, List, Optional, TextIO
+
+from pydantic import BaseModel
+
+from core.config import config, parse_values
+
+
+def to_json(value: Any) -> Any:
+    """JSON encoding of values json does not know, for json.dumps default."""
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json", exclude_none=True)
+    return str(value)
+
+
+def _shrink(value: Any, budget: List[int]) -> Any:
+    """Copies the value as JSON-encodable data of about budget[0] chars at most.
+
+    Strings are cut and containers end once the budget is spent, so the cost of
+    serializing a large request or tool result stays bounded by the budget.
+    """
+    if budget[0] <= 0:
+        return "..."
+    if value is None or isinstance(value, (bool, int, float)):
+        budget[0] -= 8
+        return value
+    if isinstance(value, Enum):
+        value = value.value
+    if isinstance(value, BaseModel):
+        value = {
+            name: field
+            for name in type(value).model_fields
+            if (field := getattr(value, name)) is not None
+        }
+    if isinstance(value, dict):
+        shrunk = {}
+        for index, (key, item) in enumerate(value.items()):
+            if budget[0] <= 0:
+                shrunk["..."] = f"+{len(value) - index} items"
+                break
+            budget[0] -= len(str(key)) + 4
+            shrunk[str(key)] = _shrink(item, budget)
+        return shrunk
+    if isinstance(value, (list, tuple, set, frozenset)):
+        shrunk = []
+        for index, item in enumerate(value):
+            if budget[0] <= 0:
+                shrunk.append(f"...(+{len(value) - index} items)")
+                break
+            budget[0] -= 2
+            shrunk.append(_shrink(item, budget))
+        return shrunk
+    text = value if isinstance(value, str) else str(value)
+    budget[0] -= len(text) + 2
+    if budget[0] < 0:
+        return f"{text[:len(text) + budget[0]]}...(+{-budget[0]} chars)"
+    return text
+
+
+class EventLog:
+    """Structured diagnostics log written as JSON lines by a background thread.
+
+    emit only puts the event on a bounded queue, the writer thread cuts every field to
+    about max_field_chars before serializing it, truncates it to max_field_chars and
+    writes the line, so no formatting or I/O happens on the event loop. Events are sampled per name with sample_rates, falling back
+    to sample_rate, and dropped when the queue is full. When the log is disabled, or an
+    event is not sampled, should_log returns False and callers skip building the fields.
+
+    The writer starts with the first event and stops before the process forks, writing
+    what is queued, so the process forks without threads and a forked worker does not
+    inherit locks held by the writer. Each process starts its own writer on its next event.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        sample_rate: float = 1.0,
+        sample_rates: Optional[Dict[str, float]] = None,
+        max_field_chars: int = 500,
+        queue_size: int = 10000,
+        stream: Optional[TextIO] = None,
+    ):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.sample_rates = sample_rates or {}
+        self.max_field_chars = max_field_chars
+        self.stream = stream or sys.stdout
+        self.dropped = 0
+        self.queue_size = queue_size
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=queue_size)
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        if enabled:
+            os.register_at_fork(before=self._stop_writer)
+
+    def _start_writer(self):
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="event-log", daemon=True)
+                self._writer.start()
+
+    def _stop_writer(self):
+        with self._writer_lock:
+            if self._writer is None:
+                return
+            self._queue.put(None)
+            self._writer.join(timeout=5)
+            self._writer = None
+
+    def should_log(self, name: str) -> bool:
+        """Tells whether an event with this name is recorded, decided by sampling."""
+        if not self.enabled:
+            return False
+        rate = self.sample_rates.get(name, self.sample_rate)
+        return rate >= 1.0 or random.random() < rate
+
+    def emit(self, name: str, **fields: Any):
+        """Queues an event, callers check should_log first to skip building the fields."""
+        if not self.enabled:
+            return
+        if self._writer is None:
+            self._start_writer()
+        try:
+            self._queue.put_nowait({"ts": time.time(), "event": name, **fields})
+        except queue.Full:
+            self.dropped += 1
+
+    def log(self, name: str, **fields: Any):
+        """Samples and queues an event whose fields are cheap to build."""
+        if self.should_log(name):
+            self.emit(name, **fields)
+
+    def _format(self, record: Dict[str, Any]) -> str:
+        line = {}
+        for key, value in record.items():
+            if not isinstance(value, (str, int, float, bool)) and value is not None:
+                try:
+                    value = json.dumps(_shrink(value, [self.max_field_chars]), ensure_ascii=False)
+                except (TypeError, ValueError):
+                    value = repr(value)
+            if isinstance(value, str) and len(value) > self.max_field_chars:
+                value = f"{value[:self.max_field_chars]}...(+{len(value) - self.max_field_chars} chars)"
+            line[key] = value
+        return json.dumps(line, ensure_ascii=False)
+
+    def _write_loop(self):
+        while True:
+            record = self._queue.get()
+            if record is None:
+                break
+            try:
+                lines = [self._format(record)]
+                while len(lines) < 100:
+                    try:
+                        record = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if record is None:
+                        self._queue.put(None)
+                        break
+                    lines.append(self._format(record))
+                self.stream.write("\n".join(lines) + "\n")
+                self.stream.flush()
+            except Exception as e:
+                sys.stderr.write(f"[EventLog] Failed to write events: {e}\n")
+
+    def close(self):
+        """Writes the queued events and stops the writer thread."""
+        self.enabled = False
+        self._stop_writer()
+
+
+event_log = EventLog(
+    enabled=config.event_log_enabled,
+    sample_rate=config.event_log_sample_rate,
+    sample_rates=parse_values(config.event_log_sample_rates),
+    max_field_chars=config.event_log_max_field_chars,
+    queue_size=config.event_log_queue_size,
+)
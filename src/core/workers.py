@@ -0,0 +1,98 @@
+import os
+import signal
+import sys
+import time
+
+from typing import Any, Callable, Dict, Optional
+
+import uvicorn
+
+from uvicorn.main import STARTUP_FAILURE
+
+# A worker exiting sooner after its start is restarted with a delay, to avoid a crash loop,
+# and the server gives up after _MAX_QUICK_EXITS of them in a row
+_MIN_WORKER_LIFETIME = 1.0
+_MAX_QUICK_EXITS = 5
+
+
+def serve(app: Any, host: str, port: int, workers: int = 1, pre_fork: Optional[Callable[[], None]] = None):
+    """Serves the app with uvicorn, from several pre-forked worker processes if asked.
+
+    The workers are forked from this process after pre_fork ran, so the imported code and
+    what pre_fork loaded are shared copy-on-write and a restarted worker boots without
+    importing anything. Every worker runs the app startup itself, connections are never
+    shared. Workers that exit are restarted until the server receives SIGINT or SIGTERM.
+    A worker failing its startup, or workers exiting right after their start again and
+    again, stop the server with the startup failure exit code, so its supervisor sees it.
+    """
+    if workers <= 1:
+        uvicorn.run(app, host=host, port=port)
+        return
+
+    sock = uvicorn.Config(app, host=host, port=port).bind_socket()
+    if pre_fork is not None:
+        pre_fork()
+
+    children: Dict[int, float] = {}
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            exit_code = 0
+            server = uvicorn.Server(uvicorn.Config(app, host=host, port=port))
+            try:
+                server.run(sockets=[sock])
+            except BaseException as e:
+                sys.stderr.write(f"[Worker {os.getpid()}] Exited with error: {e}\n")
+                exit_code = 1
+            finally:
+                os._exit(exit_code if server.started else STARTUP_FAILURE)
+        children[pid] = time.monotonic()
+
+    def stop_workers():
+        for pid in list(children):
+            os.kill(pid, signal.SIGTERM)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        # SIGINT from a terminal already reaches every worker of the process group
+        if signum == signal.SIGTERM:
+            stop_workers()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for _ in range(workers):
+        spawn()
+
+    failed = False
+    quick_exits = 0
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started_at = children.pop(pid, None)
+        if stopping or started_at is None:
+            continue
+
+        quick_exit = time.monotonic() - started_at < _MIN_WORKER_LIFETIME
+        quick_exits = quick_exits + 1 if quick_exit else 0
+        if os.waitstatus_to_exitcode(status) == STARTUP_FAILURE or quick_exits >= _MAX_QUICK_EXITS:
+            sys.stderr.write(f"[Server] Worker {pid} failed to start, stopping the server\n")
+            failed = stopping = True
+            stop_workers()
+            continue
+
+        sys.stderr.write(f"[Server] Worker {pid} exited with status {status}, restarting it\n")
+        if quick_exit:
+            time.sleep(_MIN_WORKER_LIFETIME)
+        spawn()
+
+    sock.close()
+    if failed:
+        sys.exit(STARTUP_FAILURE)
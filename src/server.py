@@ -1,11 +1,23 @@
+import time
+
+_imports_started = time.perf_counter()
+
 from dotenv import load_dotenv
 
 load_dotenv("src/agent/.env")
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from chat.route import router as chat_router
+from tool.route import router as tool_router
+from agent.warmup import is_ready
+from core.metrics import metrics
+
+# Seconds spent importing the app, profile them with `python -X importtime server.py`
+import_seconds = time.perf_counter() - _imports_started
+metrics.register_gauges("agent_boot_seconds", lambda: {"imports": import_seconds}, help="Seconds spent booting the server")
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -15,6 +27,7 @@ app = FastAPI(
 )
 
 app.include_router(chat_router, prefix="/agent", tags=["agent"])
+app.include_router(tool_router, prefix="/agent", tags=["tool"])
 
 # Add CORS middleware
 app.add_middleware(
@@ -29,7 +42,24 @@ app.add_middleware(
 async def root():
     return {"message": "Agent API is running"}
 
+@app.get("/ready")
+async def ready():
+    """Reports ready once the startup warmup completed, for load balancer readiness checks."""
+    if not is_ready():
+        return JSONResponse({"status": "warming up"}, status_code=503)
+    return {"status": "ready"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Exposes the in-process metrics in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run("server:app", host="0.0.0.0", port=8756)
\ No newline at end of file
+    from agent.warmup import pre_fork_warmup
+    from core.config import config
+    from core.workers import serve
+
+    if config.workers > 1 and config.session_backend != "sqlite":
+        raise SystemExit("WORKERS > 1 needs SESSION_BACKEND=sqlite so every worker sees the same sessions")
+    serve(app, host="0.0.0.0", port=8756, workers=config.workers, pre_fork=pre_fork_warmup)
\ No newline at end of file
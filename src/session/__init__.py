@@ -0,0 +1,2 @@
+from .bounded_session_service import BoundedSessionService
+from .sqlite_session_service import SqliteSessionService
\ No newline at end of file
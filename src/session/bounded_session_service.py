@@ -0,0 +1,234 @@
+import copy
+import threading
+import time
+import uuid
+
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, Session, State
+from google.adk.sessions.base_session_service import GetSessionConfig, ListSessionsResponse
+
+SessionKey = Tuple[str, str, str]
+UserKey = Tuple[str, str]
+
+
+class _Shard:
+    """Sessions and user state of the users hashed to one lock."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Least recently used session first
+        self.sessions: "OrderedDict[SessionKey, Session]" = OrderedDict()
+        self.last_access: Dict[SessionKey, float] = {}
+        self.user_sessions: Dict[UserKey, int] = {}
+        self.user_state: Dict[UserKey, Dict[str, Any]] = {}
+
+
+class BoundedSessionService(BaseSessionService):
+    """In-memory session service with bounded memory.
+
+    Sessions are sharded by user_id and every shard is guarded by its own lock. A shard keeps
+    at most max_sessions / num_shards sessions and evicts the least recently used one when it
+    is full, sessions not accessed for idle_ttl seconds are dropped, and only the last
+    max_events_per_session events of a session are kept. User state is dropped together with
+    the last session of its user.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 10000,
+        max_events_per_session: int = 200,
+        idle_ttl: float = 3600,
+        num_shards: int = 16,
+    ):
+        self.max_events_per_session = max_events_per_session
+        self.idle_ttl = idle_ttl
+        self.max_sessions_per_shard = max(1, -(-max_sessions // num_shards))
+        self._shards = [_Shard() for _ in range(num_shards)]
+        self._app_state: Dict[str, Dict[str, Any]] = {}
+        self._app_state_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "evicted_lru": 0,
+            "evicted_ttl": 0,
+            "trimmed_events": 0,
+        }
+
+    def _shard(self, user_id: str) -> _Shard:
+        return self._shards[hash(user_id) % len(self._shards)]
+
+    def _count(self, name: str, value: int = 1):
+        with self._stats_lock:
+            self._stats[name] += value
+
+    def _touch(self, shard: _Shard, key: SessionKey, now: float):
+        shard.sessions.move_to_end(key)
+        shard.last_access[key] = now
+
+    def _remove(self, shard: _Shard, key: SessionKey) -> bool:
+        if shard.sessions.pop(key, None) is None:
+            return False
+        del shard.last_access[key]
+
+        user_key = key[:2]
+        shard.user_sessions[user_key] -= 1
+        if not shard.user_sessions[user_key]:
+            del shard.user_sessions[user_key]
+            shard.user_state.pop(user_key, None)
+        return True
+
+    def _evict(self, shard: _Shard, now: float):
+        """Drops idle sessions, then least recently used ones above the cap. Caller holds the lock."""
+        expired = 0
+        while shard.sessions and self.idle_ttl > 0:
+            key = next(iter(shard.sessions))
+            if now - shard.last_access[key] <= self.idle_ttl:
+                break
+            self._remove(shard, key)
+            expired += 1
+        if expired:
+            self._count("evicted_ttl", expired)
+
+        evicted = 0
+        while len(shard.sessions) > self.max_sessions_per_shard:
+            self._remove(shard, next(iter(shard.sessions)))
+            evicted += 1
+        if evicted:
+            self._count("evicted_lru", evicted)
+
+    def _apply_event(self, session: Session, event: Event) -> int:
+        """Applies the event to a session and returns the number of trimmed old events."""
+        if event.actions and event.actions.state_delta:
+            for name, value in event.actions.state_delta.items():
+                if not name.startswith(State.TEMP_PREFIX):
+                    session.state[name] = value
+        session.events.append(event)
+        session.last_update_time = event.timestamp
+
+        overflow = len(session.events) - self.max_events_per_session
+        if self.max_events_per_session <= 0 or overflow <= 0:
+            return 0
+        del session.events[:overflow]
+        return overflow
+
+    def _merge_state(self, shard: _Shard, session: Session) -> Session:
+        with self._app_state_lock:
+            app_state = dict(self._app_state.get(session.app_name, {}))
+        for name, value in app_state.items():
+            session.state[State.APP_PREFIX + name] = value
+        for name, value in shard.user_state.get((session.app_name, session.user_id), {}).items():
+            session.state[State.USER_PREFIX + name] = value
+        return session
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[Dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        session_id = session_id.strip() if session_id and session_id.strip() else str(uuid.uuid4())
+        key = (app_name, user_id, session_id)
+        now = time.time()
+        session = Session(
+            app_name=app_name,
+            user_id=user_id,
+            id=session_id,
+            state=state or {},
+            last_update_time=now,
+        )
+
+        shard = self._shard(user_id)
+        with shard.lock:
+            if key not in shard.sessions:
+                shard.user_sessions[key[:2]] = shard.user_sessions.get(key[:2], 0) + 1
+            shard.sessions[key] = session
+            self._touch(shard, key, now)
+            self._evict(shard, now)
+            return self._merge_state(shard, copy.deepcopy(session))
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        key = (app_name, user_id, session_id)
+        now = time.time()
+        shard = self._shard(user_id)
+        with shard.lock:
+            self._evict(shard, now)
+            session = shard.sessions.get(key)
+            if session is None:
+                return None
+
+            self._touch(shard, key, now)
+            copied_session = self._merge_state(shard, copy.deepcopy(session))
+
+        if config:
+            if config.num_recent_events:
+                copied_session.events = copied_session.events[-config.num_recent_events:]
+            if config.after_timestamp:
+                copied_session.events = [
+                    event for event in copied_session.events if event.timestamp >= config.after_timestamp
+                ]
+        return copied_session
+
+    async def list_sessions(self, *, app_name: str, user_id: str) -> ListSessionsResponse:
+        shard = self._shard(user_id)
+        with shard.lock:
+            sessions: List[Session] = [
+                session.model_copy(update={"events": [], "state": {}})
+                for (session_app_name, session_user_id, _), session in shard.sessions.items()
+                if session_app_name == app_name and session_user_id == user_id
+            ]
+        return ListSessionsResponse(sessions=sessions)
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        shard = self._shard(user_id)
+        with shard.lock:
+            self._remove(shard, (app_name, user_id, session_id))
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        self._apply_event(session, event)
+
+        key = (session.app_name, session.user_id, session.id)
+        shard = self._shard(session.user_id)
+        with shard.lock:
+            storage_session = shard.sessions.get(key)
+            if storage_session is None:
+                return event
+
+            if event.actions and event.actions.state_delta:
+                for name, value in event.actions.state_delta.items():
+                    if name.startswith(State.APP_PREFIX):
+                        with self._app_state_lock:
+                            self._app_state.setdefault(session.app_name, {})[
+                                name.removeprefix(State.APP_PREFIX)
+                            ] = value
+                    elif name.startswith(State.USER_PREFIX):
+                        shard.user_state.setdefault(key[:2], {})[
+                            name.removeprefix(State.USER_PREFIX)
+                        ] = value
+
+            trimmed = self._apply_event(storage_session, event)
+            if trimmed:
+                self._count("trimmed_events", trimmed)
+            self._touch(shard, key, time.time())
+        return event
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the number of stored sessions and the eviction counters."""
+        sessions = 0
+        for shard in self._shards:
+            with shard.lock:
+                sessions += len(shard.sessions)
+        with self._stats_lock:
+            return {"sessions": sessions, **self._stats}
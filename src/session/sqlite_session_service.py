@@ -0,0 +1,416 @@
+import asyncio
+import json
+import sqlite3
+import time
+import uuid
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, Session, State
+from google.adk.sessions.base_session_service import GetSessionConfig, ListSessionsResponse
+
+from core.event_log import event_log
+
+SessionKey = Tuple[str, str, str]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    next_seq INTEGER NOT NULL DEFAULT 0,
+    update_time REAL NOT NULL,
+    PRIMARY KEY (app_name, user_id, session_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS events (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    timestamp REAL NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (app_name, user_id, session_id, seq)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS user_states (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    PRIMARY KEY (app_name, user_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS app_states (
+    app_name TEXT PRIMARY KEY,
+    state TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def _split_state_delta(state: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]:
+    """Splits a state delta into app, user and session state without key prefixes."""
+    app_state, user_state, session_state = {}, {}, {}
+    for name, value in state.items():
+        if name.startswith(State.APP_PREFIX):
+            app_state[name.removeprefix(State.APP_PREFIX)] = value
+        elif name.startswith(State.USER_PREFIX):
+            user_state[name.removeprefix(State.USER_PREFIX)] = value
+        elif not name.startswith(State.TEMP_PREFIX):
+            session_state[name] = value
+    return app_state, user_state, session_state
+
+
+def _merge_state(
+    app_state: Dict[str, Any],
+    user_state: Dict[str, Any],
+    session_state: Dict[str, Any]
+) -> Dict[str, Any]:
+    merged_state = dict(session_state)
+    for name, value in app_state.items():
+        merged_state[State.APP_PREFIX + name] = value
+    for name, value in user_state.items():
+        merged_state[State.USER_PREFIX + name] = value
+    return merged_state
+
+
+class SqliteSessionService(BaseSessionService):
+    """Persistent session service on a local SQLite database in WAL mode.
+
+    Several processes on one host can share the database file. Writes run on one
+    background thread and appended events are group-committed: appends arriving within
+    flush_interval seconds, or up to max_batch of them, share a single transaction.
+    Events with content wait for their commit, state-only events such as the per-turn
+    system event are queued without waiting and committed with the next batch; until
+    then reads of this process see them from the queue.
+
+    Sessions and their events are clustered by (app_name, user_id, session_id), so
+    loading a session is a single range scan. get_session loads at most the newest
+    max_loaded_events events, or fewer when a GetSessionConfig asks for it.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "sessions.db",
+        flush_interval: float = 0.005,
+        max_batch: int = 256,
+        max_loaded_events: int = 200,
+    ):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_loaded_events = max_loaded_events
+
+        self._connection = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        # Set first, workers opening the file at the same time wait for each other's schema setup
+        self._connection.execute("PRAGMA busy_timeout=5000")
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+
+        # Only this thread touches the connection, so statements run in submission order
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-session")
+        self._pending: List[Tuple[SessionKey, Event]] = []
+        self._waiters: List[asyncio.Future] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._closed = False
+
+    async def _run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    def _load_state(self, table: str, where: str, params: tuple) -> Dict[str, Any]:
+        row = self._connection.execute(f"SELECT state FROM {table} WHERE {where}", params).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def _create(self, key: SessionKey, state: Dict[str, Any], now: float) -> Optional[Dict[str, Any]]:
+        """Inserts the session and returns its state, None when the session already exists."""
+        app_name, user_id, session_id = key
+        app_state_delta, user_state_delta, session_state = _split_state_delta(state)
+
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            inserted = self._connection.execute(
+                "INSERT INTO sessions VALUES (?, ?, ?, ?, 0, ?) ON CONFLICT DO NOTHING",
+                (*key, json.dumps(session_state), now)
+            ).rowcount
+            if not inserted:
+                self._connection.execute("COMMIT")
+                return None
+
+            app_state = self._load_state("app_states", "app_name = ?", (app_name,))
+            user_state = self._load_state("user_states", "app_name = ? AND user_id = ?", (app_name, user_id))
+            app_state.update(app_state_delta)
+            user_state.update(user_state_delta)
+            if app_state_delta:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO app_states VALUES (?, ?)",
+                    (app_name, json.dumps(app_state))
+                )
+            if user_state_delta:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO user_states VALUES (?, ?, ?)",
+                    (app_name, user_id, json.dumps(user_state))
+                )
+            self._connection.execute("COMMIT")
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        return _merge_state(app_state, user_state, session_state)
+
+    def _load(self, key: SessionKey, config: Optional[GetSessionConfig]) -> Optional[Session]:
+        # One read transaction so the session, its events and the shared state are a consistent snapshot
+        self._connection.execute("BEGIN")
+        try:
+            return self._load_snapshot(key, config)
+        finally:
+            self._connection.execute("COMMIT")
+
+    def _load_snapshot(self, key: SessionKey, config: Optional[GetSessionConfig]) -> Optional[Session]:
+        app_name, user_id, session_id = key
+        row = self._connection.execute(
+            "SELECT state, update_time FROM sessions WHERE app_name = ? AND user_id = ? AND session_id = ?",
+            key
+        ).fetchone()
+        if row is None:
+            return None
+
+        limit = self.max_loaded_events
+        if config and config.num_recent_events:
+            limit = min(limit, config.num_recent_events) if limit > 0 else config.num_recent_events
+        after_timestamp = config.after_timestamp if config and config.after_timestamp else 0
+        rows = self._connection.execute(
+            "SELECT data FROM events WHERE app_name = ? AND user_id = ? AND session_id = ? AND timestamp >= ?"
+            " ORDER BY seq DESC LIMIT ?",
+            (*key, after_timestamp, limit if limit > 0 else -1)
+        ).fetchall()
+
+        app_state = self._load_state("app_states", "app_name = ?", (app_name,))
+        user_state = self._load_state("user_states", "app_name = ? AND user_id = ?", (app_name, user_id))
+        return Session(
+            app_name=app_name,
+            user_id=user_id,
+            id=session_id,
+            state=_merge_state(app_state, user_state, json.loads(row[0])),
+            events=[Event.model_validate_json(data) for (data,) in reversed(rows)],
+            last_update_time=row[1],
+        )
+
+    def _write_batch(self, batch: List[Tuple[SessionKey, Event]]):
+        """Writes a batch of appended events in one transaction."""
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            app_deltas: Dict[str, Dict[str, Any]] = {}
+            user_deltas: Dict[Tuple[str, str], Dict[str, Any]] = {}
+            session_deltas: Dict[SessionKey, Dict[str, Any]] = {}
+            for key, event in batch:
+                state_delta = event.actions.state_delta if event.actions and event.actions.state_delta else {}
+                app_state_delta, user_state_delta, session_state_delta = _split_state_delta(state_delta)
+                app_deltas.setdefault(key[0], {}).update(app_state_delta)
+                user_deltas.setdefault(key[:2], {}).update(user_state_delta)
+                session_deltas.setdefault(key, {}).update(session_state_delta)
+
+                row = self._connection.execute(
+                    "UPDATE sessions SET next_seq = next_seq + 1, update_time = MAX(update_time, ?)"
+                    " WHERE app_name = ? AND user_id = ? AND session_id = ? RETURNING next_seq",
+                    (event.timestamp, *key)
+                ).fetchone()
+                if row is None:
+                    continue
+                self._connection.execute(
+                    "INSERT INTO events VALUES (?, ?, ?, ?, ?, ?)",
+                    (*key, row[0], event.timestamp, event.model_dump_json(exclude_none=True))
+                )
+
+            for app_name, delta in app_deltas.items():
+                if delta:
+                    state = self._load_state("app_states", "app_name = ?", (app_name,))
+                    state.update(delta)
+                    self._connection.execute(
+                        "INSERT OR REPLACE INTO app_states VALUES (?, ?)", (app_name, json.dumps(state))
+                    )
+            for (app_name, user_id), delta in user_deltas.items():
+                if delta:
+                    state = self._load_state(
+                        "user_states", "app_name = ? AND user_id = ?", (app_name, user_id)
+                    )
+                    state.update(delta)
+                    self._connection.execute(
+                        "INSERT OR REPLACE INTO user_states VALUES (?, ?, ?)",
+                        (app_name, user_id, json.dumps(state))
+                    )
+            for key, delta in session_deltas.items():
+                if delta:
+                    state = self._load_state(
+                        "sessions", "app_name = ? AND user_id = ? AND session_id = ?", key
+                    )
+                    state.update(delta)
+                    self._connection.execute(
+                        "UPDATE sessions SET state = ? WHERE app_name = ? AND user_id = ? AND session_id = ?",
+                        (json.dumps(state), *key)
+                    )
+            self._connection.execute("COMMIT")
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+
+    def _schedule_flush(self):
+        if len(self._pending) >= self.max_batch:
+            self._start_flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.flush_interval, self._start_flush)
+
+    def _start_flush(self) -> Optional[asyncio.Future]:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return None
+
+        batch, waiters = self._pending, self._waiters
+        self._pending, self._waiters = [], []
+        write = asyncio.get_running_loop().run_in_executor(self._executor, self._write_batch, batch)
+
+        def notify(future: asyncio.Future):
+            for waiter in waiters:
+                if waiter.done():
+                    continue
+                if future.exception():
+                    waiter.set_exception(future.exception())
+                else:
+                    waiter.set_result(None)
+            if future.exception() and not waiters:
+                event_log.log("session_write_failed", error=str(future.exception()))
+
+        write.add_done_callback(notify)
+        return write
+
+    async def flush(self):
+        """Commits all queued events."""
+        write = self._start_flush()
+        if write is not None:
+            await write
+
+    def _drop_pending(self, key: SessionKey):
+        self._pending = [(pending_key, event) for pending_key, event in self._pending if pending_key != key]
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[Dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        session_id = session_id.strip() if session_id and session_id.strip() else str(uuid.uuid4())
+        key = (app_name, user_id, session_id)
+        now = time.time()
+        merged_state = await self._run(self._create, key, state or {}, now)
+        if merged_state is None:
+            # Another worker created it first, e.g. for the first message of the session
+            existing = await self.get_session(app_name=app_name, user_id=user_id, session_id=session_id)
+            if existing is not None:
+                return existing
+            return await self.create_session(app_name=app_name, user_id=user_id, state=state, session_id=session_id)
+        return Session(
+            app_name=app_name,
+            user_id=user_id,
+            id=session_id,
+            state=merged_state,
+            last_update_time=now,
+        )
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        key = (app_name, user_id, session_id)
+        # Queued events are not in the database yet and the executor runs the load before
+        # any later flush, so the queue as of now is exactly what the load cannot see.
+        pending = list(self._pending)
+        session = await self._run(self._load, key, config)
+        if session is None:
+            return None
+
+        for pending_key, event in pending:
+            if pending_key[0] != app_name:
+                continue
+            state_delta = event.actions.state_delta if event.actions and event.actions.state_delta else {}
+            for name, value in state_delta.items():
+                if (
+                    (pending_key == key and not name.startswith(State.TEMP_PREFIX))
+                    or name.startswith(State.APP_PREFIX)
+                    or (name.startswith(State.USER_PREFIX) and pending_key[1] == user_id)
+                ):
+                    session.state[name] = value
+            if pending_key != key:
+                continue
+            if not config or not config.after_timestamp or event.timestamp >= config.after_timestamp:
+                session.events.append(event)
+                session.last_update_time = max(session.last_update_time, event.timestamp)
+        if config and config.num_recent_events:
+            session.events = session.events[-config.num_recent_events:]
+        return session
+
+    async def list_sessions(self, *, app_name: str, user_id: str) -> ListSessionsResponse:
+        rows = await self._run(
+            lambda: self._connection.execute(
+                "SELECT session_id, update_time FROM sessions WHERE app_name = ? AND user_id = ?",
+                (app_name, user_id)
+            ).fetchall()
+        )
+        return ListSessionsResponse(sessions=[
+            Session(app_name=app_name, user_id=user_id, id=session_id, state={}, last_update_time=update_time)
+            for session_id, update_time in rows
+        ])
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        key = (app_name, user_id, session_id)
+        self._drop_pending(key)
+
+        def delete():
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._connection.execute(
+                    "DELETE FROM events WHERE app_name = ? AND user_id = ? AND session_id = ?", key
+                )
+                self._connection.execute(
+                    "DELETE FROM sessions WHERE app_name = ? AND user_id = ? AND session_id = ?", key
+                )
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+
+        await self._run(delete)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        await super().append_event(session=session, event=event)
+        if event.partial:
+            return event
+        session.last_update_time = event.timestamp
+
+        self._pending.append(((session.app_name, session.user_id, session.id), event))
+        if event.content is None:
+            # State-only events ride along with the next batch
+            self._schedule_flush()
+            return event
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._schedule_flush()
+        await waiter
+        return event
+
+    async def close(self):
+        """Commits queued events and closes the database."""
+        if self._closed:
+            return
+        self._closed = True
+        await self.flush()
+        await self._run(self._connection.close)
+        self._executor.shutdown()
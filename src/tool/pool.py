@@ -0,0 +1,235 @@
+import asyncio
+import time
+
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+
+import anyio
+import httpx
+
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.tools.base_tool import BaseTool, ToolContext
+from google.adk.tools.base_toolset import BaseToolset
+from google.adk.tools.mcp_tool.mcp_session_manager import MCPSessionManager, SseServerParams
+from google.adk.tools.mcp_tool.mcp_tool import MCPTool
+from mcp import ClientSession
+
+from core.event_log import event_log
+
+# Errors meaning the connection is gone, other errors come from the server or the tool
+CONNECTION_ERRORS = (
+    anyio.ClosedResourceError,
+    anyio.BrokenResourceError,
+    anyio.EndOfStream,
+    ConnectionError,
+    httpx.TransportError,
+)
+
+
+class _Connection:
+    """One MCP session of the pool, opened and closed by its own owner task."""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.manager: Optional[MCPSessionManager] = None
+        self.session: Optional[ClientSession] = None
+        self.healthy = False
+        self.in_flight = 0
+        self.error: Optional[Exception] = None
+        self.attempted = asyncio.Event()
+        self.wakeup = asyncio.Event()
+        self.owner: Optional[asyncio.Task] = None
+
+
+class PooledMCPTool(MCPTool):
+    """MCP tool whose calls are dispatched to the least busy connection of the pool."""
+
+    def __init__(self, *, mcp_tool, mcp_session_manager: MCPSessionManager, pool: "MCPConnectionPool"):
+        super().__init__(mcp_tool=mcp_tool, mcp_session_manager=mcp_session_manager)
+        self._pool = pool
+
+    async def run_async(self, *, args: Dict[str, Any], tool_context: ToolContext) -> Any:
+        return await self._pool.call_tool(self.name, args)
+
+
+class MCPConnectionPool(BaseToolset):
+    """Toolset spreading tool calls over several sessions to the same MCP server.
+
+    Calls go to the healthy connection with the fewest calls in flight. Every
+    health_interval seconds idle connections are pinged, a connection failing a ping or a
+    call is closed and reconnected with exponential backoff up to max_backoff seconds. A
+    call failing on a dropped connection is retried once on another one when its tool is
+    listed in idempotent_tools, others may have run on the server before the drop.
+    """
+
+    def __init__(
+        self,
+        connection_params: SseServerParams,
+        size: int = 4,
+        health_interval: float = 15,
+        health_timeout: float = 5,
+        min_backoff: float = 0.5,
+        max_backoff: float = 30,
+        acquire_timeout: float = 10,
+        idempotent_tools: Iterable[str] = (),
+    ):
+        super().__init__()
+        self.connection_params = connection_params
+        self.size = max(1, size)
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.acquire_timeout = acquire_timeout
+        self.idempotent_tools = set(idempotent_tools)
+        self.reconnects = 0
+        self.failed_calls = 0
+        self._connections: List[_Connection] = []
+        self._available = asyncio.Event()
+        self._health_task: Optional[asyncio.Task] = None
+        self._start_lock = asyncio.Lock()
+        self._closed = False
+
+    async def start(self):
+        """Opens the connections, fails if none of them could connect."""
+        async with self._start_lock:
+            if self._connections:
+                return
+            self._connections = [_Connection(index) for index in range(self.size)]
+            for connection in self._connections:
+                connection.owner = asyncio.create_task(self._own(connection))
+            await asyncio.gather(*(connection.attempted.wait() for connection in self._connections))
+
+            if not any(connection.healthy for connection in self._connections):
+                error = self._connections[0].error
+                await self.close()
+                raise ConnectionError(f"Could not connect to the MCP server: {error}")
+            if self.health_interval > 0:
+                self._health_task = asyncio.create_task(self._check_health())
+
+    async def _own(self, connection: _Connection):
+        backoff = self.min_backoff
+        while not self._closed:
+            connection.wakeup.clear()
+            manager = MCPSessionManager(connection_params=self.connection_params)
+            try:
+                connection.session = await manager.create_session()
+            except Exception as e:
+                connection.error = e
+                connection.attempted.set()
+                event_log.log("mcp_connect_failed", connection=connection.index, error=str(e), retry_in=backoff)
+                try:
+                    await asyncio.wait_for(connection.wakeup.wait(), timeout=backoff)
+                except asyncio.TimeoutError:
+                    pass
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+
+            backoff = self.min_backoff
+            connection.manager = manager
+            connection.healthy = True
+            connection.attempted.set()
+            self._available.set()
+
+            await connection.wakeup.wait()
+            connection.healthy = False
+            connection.session = None
+            await manager.close()
+            if not self._closed:
+                self.reconnects += 1
+                event_log.log("mcp_reconnect", connection=connection.index, error=str(connection.error))
+
+    def _mark_broken(self, connection: _Connection, error: Exception):
+        if connection.healthy:
+            connection.healthy = False
+            connection.error = error
+            connection.wakeup.set()
+
+    async def _check_health(self):
+        while not self._closed:
+            await asyncio.sleep(self.health_interval)
+            for connection in self._connections:
+                # A connection with calls in flight is in use, pinging it only adds load
+                if not connection.healthy or connection.in_flight:
+                    continue
+                try:
+                    await asyncio.wait_for(connection.session.send_ping(), timeout=self.health_timeout)
+                except Exception as e:
+                    self._mark_broken(connection, e)
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[_Connection]:
+        """Lends the healthy connection with the fewest calls in flight."""
+        if not self._connections:
+            await self.start()
+
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            healthy = [connection for connection in self._connections if connection.healthy]
+            if healthy:
+                break
+            if self._closed:
+                raise ConnectionError("MCP connection pool is closed")
+            self._available.clear()
+            try:
+                await asyncio.wait_for(self._available.wait(), timeout=max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                raise ConnectionError("No MCP connection available") from None
+
+        connection = min(healthy, key=lambda connection: connection.in_flight)
+        connection.in_flight += 1
+        try:
+            yield connection
+        finally:
+            connection.in_flight -= 1
+
+    async def call_tool(self, name: str, args: Dict[str, Any]) -> Any:
+        attempts = 2 if name in self.idempotent_tools else 1
+        for attempt in range(attempts):
+            async with self.acquire() as connection:
+                try:
+                    return await connection.session.call_tool(name, arguments=args)
+                except CONNECTION_ERRORS as e:
+                    self._mark_broken(connection, e)
+                    self.failed_calls += 1
+                    if attempt == attempts - 1:
+                        raise
+
+    async def get_tools(self, readonly_context: Optional[ReadonlyContext] = None) -> List[BaseTool]:
+        for attempt in range(2):
+            async with self.acquire() as connection:
+                try:
+                    tools_response = await connection.session.list_tools()
+                    break
+                except CONNECTION_ERRORS as e:
+                    self._mark_broken(connection, e)
+                    if attempt:
+                        raise
+
+        tools = [
+            PooledMCPTool(mcp_tool=tool, mcp_session_manager=connection.manager, pool=self)
+            for tool in tools_response.tools
+        ]
+        return [tool for tool in tools if self._is_tool_selected(tool, readonly_context)]
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "connections": len(self._connections),
+            "healthy": sum(connection.healthy for connection in self._connections),
+            "in_flight": sum(connection.in_flight for connection in self._connections),
+            "reconnects": self.reconnects,
+            "failed_calls": self.failed_calls,
+        }
+
+    async def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        if self._health_task is not None:
+            self._health_task.cancel()
+        for connection in self._connections:
+            connection.wakeup.set()
+        await asyncio.gather(
+            *(connection.owner for connection in self._connections if connection.owner),
+            return_exceptions=True,
+        )
@@ -0,0 +1,274 @@
+import asyncio
+import hashlib
+import json
+import time
+
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.tools.base_tool import BaseTool, ToolContext
+from google.adk.tools.base_toolset import BaseToolset
+from google.genai import types
+
+from core.event_log import event_log
+
+
+def tools_fingerprint(tools: List[BaseTool]) -> str:
+    """Hashes the names, descriptions and input schemas of the tools."""
+    described = []
+    for tool in tools:
+        # MCP tools carry the raw schema, hashing it avoids building the declaration
+        mcp_tool = getattr(tool, "_mcp_tool", None)
+        if mcp_tool is not None:
+            schema = mcp_tool.inputSchema
+        else:
+            declaration = tool._get_declaration()
+            schema = declaration.model_dump(mode="json", exclude_none=True) if declaration else None
+        described.append([tool.name, tool.description, schema])
+    return hashlib.sha256(json.dumps(described, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class ToolsetGeneration:
+    """One connection of a toolset together with the tools cached from it.
+
+    The connection is opened and closed by the same owner task, MCP sessions cannot
+    be closed from another task than the one they were opened in.
+    """
+
+    def __init__(self, toolset: BaseToolset, version: int):
+        self.toolset = toolset
+        self.version = version
+        self.tools: List["CachedTool"] = []
+        self.fingerprint: Optional[str] = None
+        self.in_flight = 0
+        self.idle = asyncio.Event()
+        self.idle.set()
+        self.closed = False
+        self._close_requested = asyncio.Event()
+        self._owner: Optional[asyncio.Task] = None
+
+    async def open(self) -> List[BaseTool]:
+        """Connects in the owner task and returns the tool list fetched on connect."""
+        ready = asyncio.get_running_loop().create_future()
+        self._owner = asyncio.create_task(self._own(ready))
+        return await ready
+
+    async def _own(self, ready: asyncio.Future):
+        try:
+            tools = await self.toolset.get_tools()
+        except Exception as e:
+            ready.set_exception(e)
+            await self.toolset.close()
+            return
+        ready.set_result(tools)
+
+        await self._close_requested.wait()
+        await self.toolset.close()
+
+    async def close(self):
+        self.closed = True
+        self._close_requested.set()
+        if self._owner is not None:
+            # Shielded so a caller cancelled meanwhile does not interrupt the close
+            await asyncio.shield(self._owner)
+
+
+class CachedTool(BaseTool):
+    """Delegates calls to a tool and reuses its function declaration built once.
+
+    Calls are counted per generation so a retired connection is closed only when idle,
+    and calls arriving after it closed are routed to the current generation.
+    """
+
+    def __init__(self, tool: BaseTool, registry: "ToolRegistry", generation: ToolsetGeneration):
+        super().__init__(name=tool.name, description=tool.description, is_long_running=tool.is_long_running)
+        self.tool = tool
+        self.registry = registry
+        self.generation = generation
+        self._declaration = tool._get_declaration()
+
+    def _get_declaration(self) -> Optional[types.FunctionDeclaration]:
+        return self._declaration
+
+    async def run_async(self, *, args: Dict[str, Any], tool_context: ToolContext) -> Any:
+        generation = self.generation
+        if generation.closed:
+            current_tool = self.registry.get_tool(self.name)
+            if current_tool is None or current_tool.generation.closed:
+                raise ValueError(f"Tool {self.name} is no longer provided by the toolset")
+            return await current_tool.run_async(args=args, tool_context=tool_context)
+
+        generation.in_flight += 1
+        generation.idle.clear()
+        try:
+            return await self.tool.run_async(args=args, tool_context=tool_context)
+        finally:
+            generation.in_flight -= 1
+            if not generation.in_flight:
+                generation.idle.set()
+
+
+class ToolRegistry(BaseToolset):
+    """Caches the tools of a toolset together with their declarations.
+
+    The tool list is fetched once and served from memory on every model call. Every
+    refresh_interval seconds it is fetched again in the background, and the cached tools
+    are only rebuilt when the fingerprint of the list differs.
+
+    swap() replaces the connection blue/green: a new toolset from toolset_factory connects
+    and warms while the current one keeps serving, new turns then switch to it atomically,
+    and the old connection is closed once its in-flight calls finished, after at least
+    drain_grace and at most drain_timeout seconds.
+    """
+
+    def __init__(
+        self,
+        toolset_factory: Callable[[], BaseToolset],
+        refresh_interval: float = 60,
+        drain_grace: float = 5,
+        drain_timeout: float = 60,
+    ):
+        super().__init__()
+        self.toolset_factory = toolset_factory
+        self.refresh_interval = refresh_interval
+        self.drain_grace = drain_grace
+        self.drain_timeout = drain_timeout
+        self.version = 0
+        self._current: Optional[ToolsetGeneration] = None
+        self._tools_by_name: Dict[str, CachedTool] = {}
+        self._checked_at = 0.0
+        self._refresh_lock = asyncio.Lock()
+        self._swap_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        # Generations closing once drained, by the task retiring them
+        self._retiring: Dict[asyncio.Task, ToolsetGeneration] = {}
+
+    @property
+    def fingerprint(self) -> Optional[str]:
+        return self._current.fingerprint if self._current else None
+
+    def _install(self, generation: ToolsetGeneration, tools: List[BaseTool]):
+        """Builds the cached tools of the generation and makes it the current one."""
+        self.version += 1
+        generation.version = self.version
+        generation.tools = [CachedTool(tool, self, generation) for tool in tools]
+        generation.fingerprint = tools_fingerprint(tools)
+        self._current = generation
+        self._tools_by_name = {tool.name: tool for tool in generation.tools}
+        self._checked_at = time.monotonic()
+        event_log.log("tools_loaded", version=self.version, tools=list(self._tools_by_name))
+
+    async def start(self):
+        """Connects the first toolset."""
+        async with self._swap_lock:
+            if self._current is None:
+                generation = ToolsetGeneration(self.toolset_factory(), self.version + 1)
+                self._install(generation, await generation.open())
+
+    async def get_tools(self, readonly_context: Optional[ReadonlyContext] = None) -> List[BaseTool]:
+        if self._current is None:
+            await self.start()
+        elif (
+            self.refresh_interval > 0
+            and time.monotonic() - self._checked_at > self.refresh_interval
+            and (self._refresh_task is None or self._refresh_task.done())
+        ):
+            self._refresh_task = asyncio.create_task(self._refresh_in_background())
+        return [tool for tool in self._current.tools if self._is_tool_selected(tool, readonly_context)]
+
+    def get_tool(self, name: str) -> Optional[CachedTool]:
+        return self._tools_by_name.get(name)
+
+    async def _refresh_in_background(self):
+        try:
+            await self.refresh()
+        except Exception as e:
+            event_log.log("tool_refresh_failed", error=str(e))
+
+    async def refresh(self, force: bool = False) -> bool:
+        """Fetches the tool list over the current connection and rebuilds the cache if it changed."""
+        if self._current is None:
+            await self.start()
+            return True
+
+        async with self._refresh_lock:
+            generation = self._current
+            tools = await generation.toolset.get_tools()
+            self._checked_at = time.monotonic()
+            if generation is not self._current:
+                return False
+            if not force and tools_fingerprint(tools) == generation.fingerprint:
+                return False
+
+            self._install(generation, tools)
+            return True
+
+    async def swap(self) -> int:
+        """Replaces the connection with a new warmed one and retires the old one in the background."""
+        async with self._swap_lock:
+            generation = ToolsetGeneration(self.toolset_factory(), self.version + 1)
+            tools = await generation.open()
+
+            old_generation = self._current
+            self._install(generation, tools)
+            if old_generation is not None:
+                task = asyncio.create_task(self._retire(old_generation))
+                self._retiring[task] = old_generation
+                task.add_done_callback(lambda task: self._retiring.pop(task, None))
+            return self.version
+
+    async def _retire(self, generation: ToolsetGeneration):
+        # Turns that already built their request with the old tools may still call them
+        await asyncio.sleep(self.drain_grace)
+        try:
+            await asyncio.wait_for(generation.idle.wait(), timeout=self.drain_timeout)
+        except asyncio.TimeoutError:
+            event_log.log("toolset_drain_timeout", version=generation.version, in_flight=generation.in_flight)
+        try:
+            await generation.close()
+        except Exception as e:
+            event_log.log("toolset_close_failed", version=generation.version, error=str(e))
+        event_log.log("toolset_retired", version=generation.version)
+
+    def stats(self) -> Dict[str, float]:
+        """Stats of the current toolset if it reports any, with the toolset version."""
+        stats: Dict[str, float] = {"version": self.version}
+        toolset_stats = getattr(self._current.toolset, "stats", None) if self._current else None
+        if toolset_stats is not None:
+            stats.update(toolset_stats())
+        return stats
+
+    async def tool_names(self) -> List[str]:
+        return [tool.name for tool in await self.get_tools()]
+
+    async def close(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+        retiring = dict(self._retiring)
+        for task in retiring:
+            task.cancel()
+        await asyncio.gather(*retiring, return_exceptions=True)
+        # The drain was cut short, the retired connections are closed now
+        for generation in retiring.values():
+            try:
+                await generation.close()
+            except Exception as e:
+                event_log.log("toolset_close_failed", version=generation.version, error=str(e))
+        if self._current is not None:
+            await self._current.close()
+
+
+class ToolSubset(BaseToolset):
+    """Offers only the named tools of a registry, for agents limited to some tools."""
+
+    def __init__(self, registry: ToolRegistry, tool_names: Iterable[str]):
+        super().__init__()
+        self.registry = registry
+        self.tool_names = frozenset(tool_names)
+
+    async def get_tools(self, readonly_context: Optional[ReadonlyContext] = None) -> List[BaseTool]:
+        return [tool for tool in await self.registry.get_tools(readonly_context) if tool.name in self.tool_names]
+
+    async def close(self) -> None:
+        # The registry is shared and closed by its owner
+        pass
@@ -1,42 +1,65 @@
+import asyncio
 import datetime
 
+from typing import Optional
+
 from fastapi import APIRouter, HTTPException
-from google.adk.tools.mcp_tool.mcp_toolset import MCPToolset, SseServerParams
 
-from src.tool.data_models import ToolResponse, StatusResponse
+from agent import get_tool_registry
+from core.event_log import event_log
+from tool.data_models import ToolResponse, StatusResponse
 
 router = APIRouter()
 
 @router.get("/tools", response_model=ToolResponse)
 async def get_tools():
-    global agent
+    tool_registry = get_tool_registry()
     
-    if agent is None:
+    if tool_registry is None:
         raise HTTPException(status_code=500, detail="Agent not initialized")
     
-    tool_names = [tool._get_declaration().name for tool in agent.tools]
+    tool_names = await tool_registry.tool_names()
     return ToolResponse(tools=tool_names)
 
+_swap_task: Optional[asyncio.Task] = None
+
+def _log_swap_failure(task: asyncio.Task):
+    # Retrieving the exception here also keeps asyncio from reporting it as never
+    # retrieved when no request waits for the swap, waiting requests still get it
+    if not task.cancelled() and task.exception() is not None:
+        event_log.log("toolset_swap_failed", error=str(task.exception()))
+
+@router.on_event("shutdown")
+async def shutdown_event():
+    tool_registry = get_tool_registry()
+    if tool_registry is not None:
+        await tool_registry.close()
+
 @router.post("/update-toolset", response_model=StatusResponse)
-async def update_toolset():
-    global agent, exit_stack
+async def update_toolset(wait: bool = False):
+    """Connects a new toolset in the background and switches new turns to it once warmed.
+
+    Turns keep using the current connection meanwhile, with wait the response is sent
+    after the switch.
+    """
+    global _swap_task
+    tool_registry = get_tool_registry()
     
-    if agent is None:
+    if tool_registry is None:
         raise HTTPException(status_code=500, detail="Agent not initialized")
     
-    # Close existing exit stack
-    await exit_stack.aclose()
-    
-    # Get new tools
-    new_tools, new_exit_stack = await MCPToolset.from_server(
-        connection_params=SseServerParams(
-            url="http://127.0.0.1:17234/sse"
-        )
-    )
-    
-    # Update agent tools
-    agent.tools = new_tools
-    exit_stack = new_exit_stack
+    if _swap_task is None or _swap_task.done():
+        _swap_task = asyncio.create_task(tool_registry.swap())
+        _swap_task.add_done_callback(_log_swap_failure)
+
+    timestamp = datetime.datetime.now().isoformat()
+    if not wait:
+        return StatusResponse(status="Toolset update started", timestamp=timestamp)
+
+    try:
+        version = await asyncio.shield(_swap_task)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Toolset update failed: {e}")
     
     timestamp = datetime.datetime.now().isoformat()
-    return StatusResponse(status="Toolset updated successfully", timestamp=timestamp)
+    return StatusResponse(status=f"Toolset updated successfully to version {version}", timestamp=timestamp)